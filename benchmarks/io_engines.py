@@ -0,0 +1,94 @@
+"""Compare the disk I/O engines on many concurrent 16 MB chunk writes.
+
+Run from the repository root, pointing --dir at the disk you want to test:
+
+    python benchmarks/io_engines.py --dir /mnt/data/bench --chunks 128 --concurrency 16
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+
+
+async def run_engine(engine, directory: str, chunk: bytes, chunks: int, concurrency: int):
+    volume = main.StorageVolume(directory)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    
+    async def write_chunk(index: int):
+        async with semaphore:
+            start = time.perf_counter()
+            await engine.write_file(volume, os.path.join(directory, f"chunk_{index:06d}"), [chunk])
+            latencies.append(time.perf_counter() - start)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(write_chunk(i) for i in range(chunks)))
+    elapsed = time.perf_counter() - start
+    
+    latencies.sort()
+    return {
+        'engine': engine.name,
+        'seconds': elapsed,
+        'mb_s': len(chunk) * chunks / elapsed / (1024 * 1024),
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    }
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", help="Directory on the disk under test (default: a temp dir)")
+    parser.add_argument("--chunks", type=int, default=64)
+    parser.add_argument("--chunk-mb", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--threads", type=int, default=main.IO_THREADS_PER_VOLUME)
+    parser.add_argument("--engines", default="aiofiles,threads,io_uring")
+    parser.add_argument("--write-mode", default=main.WRITE_MODE, choices=["buffered", "dontneed", "direct"])
+    parser.add_argument("--durability", default="none", choices=["none", "chunk", "interval", "complete"])
+    args = parser.parse_args()
+    
+    base_dir = args.dir or tempfile.mkdtemp(prefix="io-bench-")
+    chunk = os.urandom(args.chunk_mb * 1024 * 1024)
+    
+    print(f"Writing {args.chunks} x {args.chunk_mb} MB chunks, {args.concurrency} at a time, to {base_dir}")
+    print(f"{'engine':<10} {'seconds':>8} {'MB/s':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for name in args.engines.split(","):
+        if name == "io_uring":
+            try:
+                engine = main.IoUringIOEngine(args.threads, write_mode=args.write_mode, durability=args.durability)
+            except (ImportError, OSError) as e:
+                print(f"{name:<10} skipped: {e}")
+                continue
+        elif name == "threads":
+            engine = main.ThreadPoolIOEngine(args.threads, args.write_mode, args.durability)
+        else:
+            try:
+                engine = main.AiofilesIOEngine(args.write_mode, args.durability)
+            except ValueError as e:
+                print(f"{name:<10} skipped: {e}")
+                continue
+        
+        directory = os.path.join(base_dir, name)
+        os.makedirs(directory, exist_ok=True)
+        try:
+            result = asyncio.run(run_engine(engine, directory, chunk, args.chunks, args.concurrency))
+        finally:
+            engine.shutdown()
+            shutil.rmtree(directory, ignore_errors=True)
+        print(f"{result['engine']:<10} {result['seconds']:>8.2f} {result['mb_s']:>9.1f} "
+              f"{result['p50_ms']:>9.1f} {result['p99_ms']:>9.1f}")
+    
+    if not args.dir:
+        shutil.rmtree(base_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main_benchmark()
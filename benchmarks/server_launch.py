@@ -0,0 +1,170 @@
+"""Compare server launch settings: time to first response and upload throughput per connection.
+
+Starts main.py once per combination of event loop and socket receive buffer (0 keeps
+kernel autotuning), waits for the first response, then pushes chunks over parallel
+keep-alive connections. Run from the repository root:
+
+    python benchmarks/server_launch.py --loops asyncio,uvloop --rcvbufs 0,4194304 --connections 8
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_ready(port: int, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with code {process.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.005)
+    raise RuntimeError("server did not start in time")
+
+
+def upload(port: int, chunk: bytes, chunks: int, barrier: threading.Barrier, results: list):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    upload_id = uuid.uuid4().hex
+    conn.request("POST", "/start-upload", json.dumps({
+        "upload_id": upload_id,
+        "filename": f"{upload_id}.bin",
+        "total_size": len(chunk) * chunks,
+        "total_chunks": chunks
+    }), {"Content-Type": "application/json"})
+    conn.getresponse().read()
+
+    boundary = uuid.uuid4().hex
+    suffix = f"\r\n--{boundary}--\r\n".encode()
+    barrier.wait()
+    start = time.perf_counter()
+    for index in range(chunks):
+        # Fields go before the file part so the chunk itself is sent without copying
+        prefix = (
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"chunk_index\"\r\n\r\n{index}\r\n"
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"total_chunks\"\r\n\r\n{chunks}\r\n"
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"chunk\"; filename=\"blob\"\r\n"
+            f"Content-Type: application/octet-stream\r\n\r\n"
+        ).encode()
+        conn.putrequest("POST", f"/upload-chunk/{upload_id}")
+        conn.putheader("Content-Type", f"multipart/form-data; boundary={boundary}")
+        conn.putheader("Content-Length", str(len(prefix) + len(chunk) + len(suffix)))
+        conn.endheaders()
+        conn.send(prefix)
+        conn.send(chunk)
+        conn.send(suffix)
+        response = conn.getresponse()
+        response.read()
+        if response.status != 200:
+            raise RuntimeError(f"chunk {index} failed with {response.status}")
+    results.append(len(chunk) * chunks / (time.perf_counter() - start) / (1024 * 1024))
+    conn.close()
+
+
+def run_setting(loop: str, rcvbuf: int, args, chunk: bytes):
+    work_dir = tempfile.mkdtemp(prefix="launch-bench-", dir=args.dir)
+    config = os.path.join(work_dir, "config.json")
+    with open(config, "w") as f:
+        json.dump({
+            "UPLOAD_DIR": os.path.join(work_dir, "uploads"),
+            "TEMP_DIR": os.path.join(work_dir, "chunks"),
+            "DURABILITY": args.durability
+        }, f)
+
+    port = free_port()
+    command = [sys.executable, MAIN, "--config", config, "--host", "127.0.0.1", "--port", str(port), "--loop", loop]
+    if rcvbuf:
+        command += ["--rcvbuf", str(rcvbuf)]
+
+    start = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_ready(port, process)
+        startup = time.perf_counter() - start
+
+        results = []
+        barrier = threading.Barrier(args.connections)
+        threads = [
+            threading.Thread(target=upload, args=(port, chunk, args.chunks, barrier, results))
+            for _ in range(args.connections)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        if len(results) != args.connections:
+            raise RuntimeError("some connections failed")
+
+        start = time.perf_counter()
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=60)
+        shutdown = time.perf_counter() - start
+    finally:
+        if process.poll() is None:
+            process.kill()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'loop': loop,
+        'rcvbuf': rcvbuf or "auto",
+        'startup_s': startup,
+        'conn_mb_s': statistics.mean(results),
+        'min_conn_mb_s': min(results),
+        'total_mb_s': len(chunk) * args.chunks * args.connections / elapsed / (1024 * 1024),
+        'shutdown_s': shutdown
+    }
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", help="Scratch directory for uploads (default: a temp dir)")
+    parser.add_argument("--loops", default="asyncio,uvloop")
+    parser.add_argument("--rcvbufs", default="0,4194304", help="Receive buffer sizes in bytes, 0 for autotuning")
+    parser.add_argument("--connections", type=int, default=4)
+    parser.add_argument("--chunks", type=int, default=8, help="Chunks sent per connection")
+    parser.add_argument("--chunk-mb", type=int, default=16)
+    parser.add_argument("--durability", default="none", choices=["none", "chunk", "interval", "complete"])
+    args = parser.parse_args()
+
+    chunk = os.urandom(args.chunk_mb * 1024 * 1024)
+    print(f"{args.connections} connections x {args.chunks} x {args.chunk_mb} MB chunks per setting")
+    print(f"{'loop':<8} {'rcvbuf':>8} {'startup s':>10} {'MB/s/conn':>10} {'min':>8} {'total MB/s':>11} {'stop s':>7}")
+    for loop in args.loops.split(","):
+        for rcvbuf in (int(size) for size in args.rcvbufs.split(",")):
+            try:
+                result = run_setting(loop, rcvbuf, args, chunk)
+            except RuntimeError as e:
+                print(f"{loop:<8} {rcvbuf or 'auto':>8} failed: {e}")
+                continue
+            print(
+                f"{result['loop']:<8} {result['rcvbuf']:>8} {result['startup_s']:>10.2f} {result['conn_mb_s']:>10.1f} "
+                f"{result['min_conn_mb_s']:>8.1f} {result['total_mb_s']:>11.1f} {result['shutdown_s']:>7.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -1,28 +1,36 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Request, Form
-from fastapi.responses import HTMLResponse, JSONResponse
-from fastapi.staticfiles import StaticFiles
-import aiofiles
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 import os
 import hashlib
 import time
 from typing import Optional
 import asyncio
 from pathlib import Path
-import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
 import json
+import gzip
+import socket
+import argparse
+import sys
+import hmac
+import collections
+import contextvars
 import shutil
+import threading
+import functools
+import struct
+import bisect
+import mmap
+import ctypes
+import ctypes.util
+from concurrent.futures import ThreadPoolExecutor
 
-app = FastAPI(title="Ultra Fast Video Upload Server", version="1.0.0")
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows, direct writes fall back to buffered
 
-# Enable CORS for all origins
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+app = FastAPI(title="Ultra Fast Video Upload Server", version="1.0.0")
 
 # Configuration
 UPLOAD_DIR = "uploaded_videos"
@@ -30,9 +38,628 @@ CHUNK_SIZE = 128 * 1024 * 1024
 MAX_FILE_SIZE = 500 * 1024 * 1024 * 1024 
 TEMP_DIR = "temp_chunks"
 
+# Storage volumes - list one directory per disk to spread writes across them
+UPLOAD_DIRS = None  # None means [UPLOAD_DIR]
+TEMP_DIRS = None  # None means [TEMP_DIR]
+STRIPE_CHUNKS = True  # Spread a single upload's chunks across all temp volumes
+
+# Admission control - back off clients instead of swapping or filling the disk
+MAX_INFLIGHT_BYTES = 1024 * 1024 * 1024  # Chunk bytes held in memory at once
+MIN_FREE_MEMORY = 512 * 1024 * 1024
+UPLOAD_IDLE_TIMEOUT = 60 * 60  # Stop reserving disk and S3 object names for uploads idle this long
+
+# Disk I/O engine - "threads", "io_uring" (Linux, needs the liburing package) or "aiofiles"
+IO_ENGINE = "threads"
+IO_THREADS_PER_VOLUME = 4
+IO_URING_DEPTH = 32
+ASSEMBLY_BATCH_CHUNKS = 4  # Chunks combined into one vectored write in complete-upload
+
+# Write path - "buffered", "dontneed" (stream to disk and drop written pages from the cache)
+# or "direct" (aligned O_DIRECT writes that bypass the page cache)
+WRITE_MODE = "buffered"
+# Durability - "none", "chunk" (fdatasync every write), "interval" (flush a volume after every
+# FSYNC_INTERVAL_BYTES written to it) or "complete" (fsync the final file before acknowledging)
+DURABILITY = "complete"
+FSYNC_INTERVAL_BYTES = 256 * 1024 * 1024
+
+# Storage backend - "local" (temp and upload volumes) or "s3" (S3-compatible multipart, needs boto3)
+STORAGE_BACKEND = "local"
+S3_BUCKET = "uploads"
+S3_PREFIX = "uploads/"
+S3_ENDPOINT_URL = None  # e.g. "http://localhost:9000" for MinIO
+S3_REGION = None
+S3_MAX_CONCURRENCY = 16
+
+# At-rest encryption - AES-256-GCM per chunk as it streams in (needs the cryptography package)
+ENCRYPT_AT_REST = False
+ENCRYPTION_KEY_FILE = "encryption.key"  # 32 raw bytes, generated on first use if missing
+ENCRYPTION_THREADS = os.cpu_count() or 4
+
+# Compression - "zstd" compresses each chunk as an independent frame (needs the zstandard package),
+# uploads can opt in or out with the "compression" field of /start-upload
+COMPRESSION_DEFAULT = "none"
+COMPRESSION_LEVEL = 3
+COMPRESSION_THREADS = os.cpu_count() or 4
+COMPRESSION_SAMPLE_SIZE = 256 * 1024
+COMPRESSION_MIN_SAVING = 0.1  # Store data raw unless zstd saves at least 10%
+
+# Static client - built once at startup with content-hashed names and gzip/brotli variants
+# (brotli needs the brotli package, gzip is always available)
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+STATIC_ENTRY = "index.html"
+STATIC_ASSETS = ["hash-worker.js", "upload.css", "upload.js"]  # Built in order, before STATIC_ENTRY
+STATIC_TYPES = {
+    ".html": "text/html",
+    ".css": "text/css",
+    ".js": "text/javascript"
+}
+STATIC_MAX_AGE = 365 * 24 * 60 * 60
+
+# Diagnostics - /admin endpoints need this token in the X-Admin-Token header (disabled while None)
+ADMIN_TOKEN = None
+PUBLIC_DOWNLOADS = False  # Serve /download to anyone, otherwise it needs the admin token
+LOOP_LAG_INTERVAL = 0.1  # How often event loop responsiveness is sampled, in seconds
+SLOW_CALLBACK_THRESHOLD = 0.1  # Log callbacks holding the event loop longer than this (0 disables)
+PROFILE_MAX_SECONDS = 120
+
+# Server launcher - python main.py --help; a JSON config file (--config, or $UPLOAD_SERVER_CONFIG
+# when run as uvicorn main:app) can override any setting above by name
+SERVER_HOST = "0.0.0.0"  # Allow access from network
+SERVER_PORT = 8000
+# "auto" picks uvloop when installed (uvicorn[standard] ships it). uvloop runs callbacks in C, so
+# slow callbacks are only traced to routes on "asyncio" - use it while diagnosing, lag is sampled on both
+SERVER_LOOP = "auto"
+SERVER_BACKLOG = 2048  # Connections the kernel queues before accept, capped by net.core.somaxconn
+SOCKET_RCVBUF = None  # Receive buffer per connection in bytes, None keeps kernel autotuning
+SHUTDOWN_DRAIN_TIMEOUT = 60  # Seconds in-flight chunks get to finish on shutdown before being cancelled
+
+def load_config_file(path: str):
+    """Override the settings above from a JSON object keyed by setting name"""
+    with open(path) as f:
+        overrides = json.load(f)
+    settings = {name for name, value in globals().items() if name.isupper() and not callable(value)}
+    unknown = sorted(set(overrides) - settings)
+    if unknown:
+        raise SystemExit(f"❌ Unknown settings in {path}: {', '.join(unknown)}")
+    globals().update(overrides)
+
+def parse_launcher_args(argv=None):
+    parser = argparse.ArgumentParser(description="Ultra Fast Video Upload Server")
+    parser.add_argument("--config", help='JSON file of settings to override, e.g. {"CHUNK_SIZE": 67108864}')
+    parser.add_argument("--host", help=f"Address to listen on (default {SERVER_HOST})")
+    parser.add_argument("--port", type=int, help=f"Port to listen on (default {SERVER_PORT})")
+    parser.add_argument("--loop", choices=["auto", "uvloop", "asyncio"], help=f"Event loop (default {SERVER_LOOP})")
+    parser.add_argument("--backlog", type=int, help=f"Listen backlog (default {SERVER_BACKLOG})")
+    parser.add_argument("--rcvbuf", type=int, help="Socket receive buffer in bytes (default: kernel autotuning)")
+    parser.add_argument("--drain-timeout", type=float, help=f"Shutdown drain timeout in seconds (default {SHUTDOWN_DRAIN_TIMEOUT})")
+    return parser.parse_args(argv)
+
+def apply_launcher_args(args):
+    config = args.config or os.environ.get("UPLOAD_SERVER_CONFIG")
+    if config:
+        load_config_file(config)
+    for name, value in (
+        ("SERVER_HOST", args.host),
+        ("SERVER_PORT", args.port),
+        ("SERVER_LOOP", args.loop),
+        ("SERVER_BACKLOG", args.backlog),
+        ("SOCKET_RCVBUF", args.rcvbuf),
+        ("SHUTDOWN_DRAIN_TIMEOUT", args.drain_timeout)
+    ):
+        if value is not None:
+            globals()[name] = value
+
+# Settings must be final before the volumes, engines and backends below are built from them
+if __name__ == "__main__":
+    apply_launcher_args(parse_launcher_args())
+elif os.environ.get("UPLOAD_SERVER_CONFIG"):
+    load_config_file(os.environ["UPLOAD_SERVER_CONFIG"])
+
+# Settings derived from others, resolved after the overrides so they follow them
+if UPLOAD_DIRS is None:
+    UPLOAD_DIRS = [UPLOAD_DIR]
+if TEMP_DIRS is None:
+    TEMP_DIRS = [TEMP_DIR]
+
 # Ensure directories exist
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-os.makedirs(TEMP_DIR, exist_ok=True)
+for directory in UPLOAD_DIRS + TEMP_DIRS:
+    os.makedirs(directory, exist_ok=True)
+
+class StorageVolume:
+    def __init__(self, path: str):
+        self.path = path
+        self.bytes_written = 0
+        self.pending_bytes = 0
+        self.unsynced_bytes = 0
+        self.write_throughput = 0.0  # bytes per second, smoothed
+    
+    def free_space(self):
+        return shutil.disk_usage(self.path).free
+    
+    def record_write(self, nbytes: int, seconds: float):
+        self.bytes_written += nbytes
+        if seconds <= 0:
+            return
+        rate = nbytes / seconds
+        if self.write_throughput == 0:
+            self.write_throughput = rate
+        else:
+            self.write_throughput = 0.8 * self.write_throughput + 0.2 * rate
+    
+    def get_stats(self):
+        usage = shutil.disk_usage(self.path)
+        return {
+            'path': os.path.abspath(self.path),
+            'total': f"{usage.total / (1024**3):.1f} GB",
+            'used': f"{usage.used / (1024**3):.1f} GB",
+            'free': f"{usage.free / (1024**3):.1f} GB",
+            'usage_percent': round(usage.used / usage.total * 100, 1) if usage.total else 0,
+            'bytes_written': self.bytes_written,
+            'pending_bytes': self.pending_bytes,
+            'write_speed_mb_s': round(self.write_throughput / (1024 * 1024), 2)
+        }
+
+class VolumeManager:
+    def __init__(self, upload_dirs, temp_dirs):
+        self.upload_volumes = [StorageVolume(path) for path in upload_dirs]
+        self.temp_volumes = [StorageVolume(path) for path in temp_dirs]
+    
+    def pick(self, volumes, size: int):
+        """Pick the volume expected to finish this write soonest among those with room for it"""
+        candidates = []
+        for volume in volumes:
+            free = volume.free_space() - volume.pending_bytes
+            if free < size:
+                continue
+            if volume.write_throughput:
+                eta = (volume.pending_bytes + size) / volume.write_throughput
+                candidates.append((1, eta, -free, volume))
+            else:
+                # Try unmeasured volumes first so every disk gets a throughput estimate
+                candidates.append((0, volume.pending_bytes, -free, volume))
+        
+        if not candidates:
+            raise HTTPException(status_code=507, detail="Insufficient storage space on all volumes")
+        
+        candidates.sort(key=lambda c: c[:3])
+        return candidates[0][3]
+    
+    def volume_for(self, path: str):
+        """Temp volume holding a chunk file (chunks live in <volume>/<upload_id>/)"""
+        chunk_root = os.path.normpath(os.path.dirname(os.path.dirname(path)))
+        for volume in self.temp_volumes:
+            if os.path.normpath(volume.path) == chunk_root:
+                return volume
+        return self.temp_volumes[0]
+    
+    def upload_volume_for(self, path: str):
+        directory = os.path.normpath(os.path.dirname(path))
+        for volume in self.upload_volumes:
+            if os.path.normpath(volume.path) == directory:
+                return volume
+        return self.upload_volumes[0]
+    
+    def disk_usage(self, volumes):
+        """Used and free bytes across the filesystems holding volumes, each filesystem counted once"""
+        devices = {}
+        for volume in volumes:
+            devices[os.stat(volume.path).st_dev] = shutil.disk_usage(volume.path)
+        return sum(usage.used for usage in devices.values()), sum(usage.free for usage in devices.values())
+    
+    def get_stats(self):
+        return {
+            'upload': [volume.get_stats() for volume in self.upload_volumes],
+            'temp': [volume.get_stats() for volume in self.temp_volumes]
+        }
+
+volume_manager = VolumeManager(UPLOAD_DIRS, TEMP_DIRS)
+
+IOV_MAX = 1024
+DIRECT_IO_ALIGNMENT = 4096
+DIRECT_IO_STAGING_BYTES = 8 * 1024 * 1024
+
+SYNC_FILE_RANGE_WAIT_BEFORE = 1
+SYNC_FILE_RANGE_WRITE = 2
+SYNC_FILE_RANGE_WAIT_AFTER = 4
+SYNC_FILE_RANGE_WAIT_ALL = SYNC_FILE_RANGE_WAIT_BEFORE | SYNC_FILE_RANGE_WRITE | SYNC_FILE_RANGE_WAIT_AFTER
+
+_libc_path = ctypes.util.find_library("c")
+_libc = ctypes.CDLL(_libc_path, use_errno=True) if _libc_path else None  # None on Windows
+
+# macOS and Windows have no fdatasync, a full fsync is the closest
+fdatasync = getattr(os, "fdatasync", os.fsync)
+
+def sync_file_range(fd: int, offset: int, nbytes: int, flags: int):
+    if not hasattr(_libc, 'sync_file_range'):
+        if flags & SYNC_FILE_RANGE_WAIT_AFTER:
+            fdatasync(fd)  # No range-level writeback control outside Linux
+        return
+    if _libc.sync_file_range(fd, ctypes.c_int64(offset), ctypes.c_int64(nbytes), ctypes.c_uint(flags)) != 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+
+def syncfs(path: str):
+    """Flush every dirty page of the filesystem holding path"""
+    if not hasattr(_libc, 'syncfs'):
+        os.sync()
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        _libc.syncfs(fd)
+    finally:
+        os.close(fd)
+
+def fsync_directory(path: str):
+    # Makes a newly created file's directory entry durable
+    if os.name == "nt":
+        return  # Directories can't be opened for fsync on Windows, NTFS journals the entry
+    fd = os.open(path or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class ThreadPoolIOEngine:
+    """Blocking file I/O on a dedicated thread pool per storage volume"""
+    name = "threads"
+    
+    def __init__(self, threads_per_volume: int = IO_THREADS_PER_VOLUME, write_mode: str = WRITE_MODE,
+                 durability: str = DURABILITY):
+        self.threads_per_volume = threads_per_volume
+        if write_mode == "direct" and (fcntl is None or not hasattr(os, "O_DIRECT")):
+            print("⚠️  O_DIRECT is not available on this platform, writing buffered")
+            write_mode = "buffered"
+        elif write_mode == "dontneed" and not hasattr(os, "posix_fadvise"):
+            print("⚠️  posix_fadvise is not available on this platform, writing buffered")
+            write_mode = "buffered"
+        self.write_mode = write_mode
+        self.durability = durability
+        self.executors = {}
+        self.open_files = {}
+        self.local = threading.local()
+        self.sync_lock = threading.Lock()
+    
+    def executor(self, volume: StorageVolume):
+        executor = self.executors.get(volume.path)
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=self.threads_per_volume,
+                thread_name_prefix=f"io-{os.path.basename(os.path.abspath(volume.path))}"
+            )
+            self.executors[volume.path] = executor
+        return executor
+    
+    async def run(self, volume: StorageVolume, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor(volume), func, *args)
+    
+    def _pwritev(self, fd: int, buffers, offset: int):
+        views = [memoryview(b) for b in buffers if len(b)]
+        while views:
+            written = os.pwritev(fd, views[:IOV_MAX], offset)
+            offset += written
+            # Drop what was written, a short write leaves part of a buffer behind
+            while views and written >= len(views[0]):
+                written -= len(views[0])
+                views.pop(0)
+            if written:
+                views[0] = views[0][written:]
+        return offset
+    
+    def _staging_buffer(self):
+        # Anonymous mmaps are page aligned, as O_DIRECT requires
+        if not hasattr(self.local, 'staging'):
+            self.local.staging = mmap.mmap(-1, DIRECT_IO_STAGING_BYTES)
+        return self.local.staging
+    
+    def _pwritev_buffered(self, fd: int, views, offset: int):
+        flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+        fcntl.fcntl(fd, fcntl.F_SETFL, flags & ~os.O_DIRECT)
+        try:
+            return ThreadPoolIOEngine._pwritev(self, fd, views, offset)
+        finally:
+            fcntl.fcntl(fd, fcntl.F_SETFL, flags)
+    
+    def _pwritev_direct(self, fd: int, buffers, offset: int):
+        views = [memoryview(b) for b in buffers if len(b)]
+        total = sum(len(view) for view in views)
+        
+        # Encrypted and compressed frames leave batches at odd offsets, the head up
+        # to the next aligned offset goes through the page cache so the rest stays direct
+        head = min(-offset % DIRECT_IO_ALIGNMENT, total)
+        if head:
+            head_views = []
+            remaining = head
+            while remaining:
+                take = min(len(views[0]), remaining)
+                head_views.append(views[0][:take])
+                remaining -= take
+                views[0] = views[0][take:]
+                if not len(views[0]):
+                    views.pop(0)
+            offset = self._pwritev_buffered(fd, head_views, offset)
+        aligned = (total - head) - (total - head) % DIRECT_IO_ALIGNMENT
+        
+        # Copy through an aligned staging buffer, one block at a time
+        staging = self._staging_buffer()
+        while aligned:
+            size = min(aligned, len(staging))
+            filled = 0
+            while filled < size:
+                take = min(len(views[0]), size - filled)
+                staging[filled:filled + take] = views[0][:take]
+                filled += take
+                views[0] = views[0][take:]
+                if not len(views[0]):
+                    views.pop(0)
+            offset = ThreadPoolIOEngine._pwritev(self, fd, [memoryview(staging)[:size]], offset)
+            aligned -= size
+        
+        # The unaligned tail goes through the page cache
+        if views:
+            offset = self._pwritev_buffered(fd, views, offset)
+        return offset
+    
+    def _open(self, path: str):
+        flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+        fd = None
+        if self.write_mode == "direct":
+            try:
+                fd = os.open(path, flags | os.O_DIRECT, 0o644)
+            except OSError:
+                pass  # Filesystem without O_DIRECT support (e.g. tmpfs), write buffered
+        if fd is None:
+            fd = os.open(path, flags, 0o644)
+        direct = self.write_mode == "direct" and bool(fcntl.fcntl(fd, fcntl.F_GETFL) & os.O_DIRECT)
+        self.open_files[fd] = {'path': path, 'direct': direct, 'dropped_to': 0, 'written_to': 0}
+        return fd
+    
+    def _write(self, volume: StorageVolume, fd: int, buffers, offset: int):
+        state = self.open_files[fd]
+        if state['direct']:
+            end = self._pwritev_direct(fd, buffers, offset)
+        else:
+            end = self._pwritev(fd, buffers, offset)
+        
+        if self.write_mode == "dontneed" and not state['direct']:
+            # Start writeback of what was just written, then wait for the previous
+            # window and drop it from the page cache so dirty pages never pile up
+            sync_file_range(fd, state['written_to'], end - state['written_to'], SYNC_FILE_RANGE_WRITE)
+            self._drop_written(fd, state)
+            state['written_to'] = end
+        
+        if self.durability == "chunk":
+            fdatasync(fd)
+        elif self.durability == "interval":
+            self._sync_volume_every(volume, end - offset)
+        return end
+    
+    def _drop_written(self, fd: int, state):
+        start, end = state['dropped_to'], state['written_to']
+        if end > start:
+            sync_file_range(fd, start, end - start, SYNC_FILE_RANGE_WAIT_ALL)
+            os.posix_fadvise(fd, start, end - start, os.POSIX_FADV_DONTNEED)
+            state['dropped_to'] = end
+    
+    def _sync_volume_every(self, volume: StorageVolume, nbytes: int):
+        with self.sync_lock:
+            volume.unsynced_bytes += nbytes
+            if volume.unsynced_bytes < FSYNC_INTERVAL_BYTES:
+                return
+            volume.unsynced_bytes = 0
+        syncfs(volume.path)
+    
+    def _close(self, fd: int, final: bool):
+        state = self.open_files.pop(fd)
+        try:
+            if self.write_mode == "dontneed" and not state['direct']:
+                self._drop_written(fd, state)
+            if final and self.durability != "none":
+                os.fsync(fd)
+                fsync_directory(os.path.dirname(state['path']))
+        finally:
+            os.close(fd)
+    
+    def _write_file(self, volume: StorageVolume, path: str, buffers):
+        fd = self._open(path)
+        try:
+            end = self._write(volume, fd, buffers, 0)
+        finally:
+            self._close(fd, final=False)
+        return end
+    
+    def _read_file(self, path: str):
+        with open(path, 'rb', buffering=0) as f:
+            data = f.read()
+            if self.write_mode != "buffered" and hasattr(os, "posix_fadvise"):
+                # Chunks are read once during assembly, don't refill the cache the writes kept clear
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+            return data
+    
+    def _read_at(self, path: str, offset: int, length: int):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            parts = []
+            while length > 0:
+                data = os.pread(fd, length, offset)
+                if not data:
+                    break
+                parts.append(data)
+                offset += len(data)
+                length -= len(data)
+            return parts[0] if len(parts) == 1 else b"".join(parts)
+        finally:
+            os.close(fd)
+    
+    async def write_file(self, volume: StorageVolume, path: str, buffers):
+        """Create or replace path with the concatenation of buffers, in one executor hop"""
+        return await self.run(volume, self._write_file, volume, path, buffers)
+    
+    async def read_file(self, volume: StorageVolume, path: str):
+        return await self.run(volume, self._read_file, path)
+    
+    async def read_at(self, volume: StorageVolume, path: str, offset: int, length: int):
+        return await self.run(volume, self._read_at, path, offset, length)
+    
+    async def open_file(self, volume: StorageVolume, path: str):
+        return await self.run(volume, self._open, path)
+    
+    async def write_at(self, volume: StorageVolume, handle, buffers, offset: int):
+        return await self.run(volume, self._write, volume, handle, buffers, offset)
+    
+    async def close_file(self, volume: StorageVolume, handle):
+        """Close a file opened with open_file, fsyncing it unless durability is none"""
+        await self.run(volume, self._close, handle, True)
+    
+    def shutdown(self):
+        for executor in self.executors.values():
+            executor.shutdown(wait=True)
+        self.executors.clear()
+
+class IoUringIOEngine(ThreadPoolIOEngine):
+    """Submits each batch of buffers as parallel io_uring writes from the volume's threads"""
+    name = "io_uring"
+    
+    def __init__(self, threads_per_volume: int = IO_THREADS_PER_VOLUME, depth: int = IO_URING_DEPTH,
+                 write_mode: str = WRITE_MODE, durability: str = DURABILITY):
+        super().__init__(threads_per_volume, write_mode, durability)
+        import liburing
+        self.liburing = liburing
+        self.depth = depth
+        # Fail now rather than on the first chunk if the kernel refuses io_uring
+        self._ring()
+    
+    def _ring(self):
+        if not hasattr(self.local, 'ring'):
+            ring = self.liburing.Ring()
+            self.liburing.io_uring_queue_init(self.depth, ring)
+            self.local.ring = ring
+            self.local.cqe = self.liburing.Cqe()
+        return self.local.ring, self.local.cqe
+    
+    def _pwritev(self, fd: int, buffers, offset: int):
+        uring = self.liburing
+        ring, cqe = self._ring()
+        pending = []
+        for buffer in buffers:
+            if len(buffer):
+                pending.append((bytes(buffer), offset))
+                offset += len(buffer)
+        
+        inflight = {}
+        next_id = 0
+        error = None
+        while pending or inflight:
+            while pending and error is None and len(inflight) < self.depth:
+                data, position = pending.pop()
+                sqe = uring.io_uring_get_sqe(ring)
+                uring.io_uring_prep_write(sqe, fd, data, position)
+                uring.io_uring_sqe_set_data64(sqe, next_id)
+                inflight[next_id] = (data, position)  # Keep the buffer alive until it completes
+                next_id += 1
+            if not inflight:
+                break
+            uring.io_uring_submit(ring)
+            uring.io_uring_wait_cqe(ring, cqe)
+            entry = cqe[0]
+            data, position = inflight.pop(entry.user_data)
+            try:
+                written = entry.res
+            except OSError as e:
+                error = error or e
+                written = len(data)
+            finally:
+                uring.io_uring_cq_advance(ring, 1)
+            if written < len(data):
+                pending.append((data[written:], position + written))
+        
+        # Only raise once the kernel is done with every buffer
+        if error is not None:
+            raise error
+        return offset
+
+class AiofilesIOEngine:
+    """Original behaviour: aiofiles on asyncio's shared default thread pool"""
+    name = "aiofiles"
+    
+    def __init__(self, write_mode: str = WRITE_MODE, durability: str = DURABILITY):
+        if write_mode != "buffered":
+            raise ValueError(f'The aiofiles engine only supports WRITE_MODE = "buffered", not "{write_mode}"')
+        import aiofiles
+        self.aiofiles = aiofiles
+        self.write_mode = write_mode
+        self.durability = durability
+    
+    async def _after_write(self, volume: StorageVolume, handle, nbytes: int):
+        if self.durability == "chunk":
+            await handle.flush()
+            await asyncio.to_thread(fdatasync, handle.fileno())
+        elif self.durability == "interval":
+            # Only the event loop thread touches the counter, no lock needed
+            volume.unsynced_bytes += nbytes
+            if volume.unsynced_bytes >= FSYNC_INTERVAL_BYTES:
+                volume.unsynced_bytes = 0
+                await handle.flush()
+                await asyncio.to_thread(syncfs, volume.path)
+    
+    async def write_file(self, volume: StorageVolume, path: str, buffers):
+        async with self.aiofiles.open(path, 'wb') as f:
+            for buffer in buffers:
+                await f.write(buffer)
+            await self._after_write(volume, f, sum(len(buffer) for buffer in buffers))
+    
+    async def read_file(self, volume: StorageVolume, path: str):
+        async with self.aiofiles.open(path, 'rb') as f:
+            return await f.read()
+    
+    async def read_at(self, volume: StorageVolume, path: str, offset: int, length: int):
+        async with self.aiofiles.open(path, 'rb') as f:
+            await f.seek(offset)
+            return await f.read(length)
+    
+    async def open_file(self, volume: StorageVolume, path: str):
+        return await self.aiofiles.open(path, 'wb')
+    
+    async def write_at(self, volume: StorageVolume, handle, buffers, offset: int):
+        start = offset
+        await handle.seek(offset)
+        for buffer in buffers:
+            await handle.write(buffer)
+            offset += len(buffer)
+        await self._after_write(volume, handle, offset - start)
+        return offset
+    
+    async def close_file(self, volume: StorageVolume, handle):
+        try:
+            if self.durability != "none":
+                await handle.flush()
+                await asyncio.to_thread(os.fsync, handle.fileno())
+        finally:
+            await handle.close()
+        if self.durability != "none":
+            await asyncio.to_thread(fsync_directory, os.path.dirname(handle.name))
+    
+    def shutdown(self):
+        pass
+
+def create_io_engine(name: str):
+    if name == "io_uring":
+        try:
+            return IoUringIOEngine()
+        except (ImportError, OSError) as e:
+            print(f"⚠️  io_uring unavailable ({e}), falling back to thread pool I/O")
+            return ThreadPoolIOEngine()
+    if name == "aiofiles":
+        return AiofilesIOEngine()
+    if not hasattr(os, "pwritev"):
+        # Windows has no positional I/O, aiofiles is the portable path
+        print("⚠️  os.pwritev is not available on this platform, using aiofiles I/O")
+        if WRITE_MODE != "buffered":
+            print(f'⚠️  WRITE_MODE = "{WRITE_MODE}" needs the thread pool engine, writing buffered')
+        return AiofilesIOEngine(write_mode="buffered")
+    return ThreadPoolIOEngine()
+
+io_engine = create_io_engine(IO_ENGINE)
 
 class UploadManager:
     def __init__(self):
@@ -48,16 +675,18 @@ class UploadManager:
             'received_chunks': set(),
             'start_time': time.time(),
             'status': 'uploading',
-            'last_activity': time.time()
+            'last_activity': time.time(),
+            'chunk_locations': {},
+            'frames': {}
         }
-        
-        # Create chunk directory
-        chunk_dir = os.path.join(TEMP_DIR, upload_id)
-        os.makedirs(chunk_dir, exist_ok=True)
+        return self.active_uploads[upload_id]
     
-    def receive_chunk(self, upload_id: str, chunk_index: int, chunk_size: int):
+    def receive_chunk(self, upload_id: str, chunk_index: int, chunk_size: int, location: str,
+                      stored_size: int, codec: Optional[str] = None):
         if upload_id in self.active_uploads:
             upload_info = self.active_uploads[upload_id]
+            upload_info['chunk_locations'][chunk_index] = location
+            upload_info['frames'][chunk_index] = (chunk_size, stored_size, codec)
             if chunk_index not in upload_info['received_chunks']:
                 upload_info['received_chunks'].add(chunk_index)
                 upload_info['uploaded_size'] += chunk_size
@@ -118,548 +747,974 @@ class UploadManager:
 
 upload_manager = UploadManager()
 
-@app.get("/", response_class=HTMLResponse)
-async def upload_page():
-    # Get server IP for network access
-    import socket
-    hostname = socket.gethostname()
-    local_ip = socket.gethostbyname(hostname)
-    
-    return f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <title>🚀 Ultra Fast Video Upload Server</title>
-    <meta charset="utf-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1">
-    <style>
-        * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-        body {{ 
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; 
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-            color: #333;
-        }}
-        .container {{ 
-            max-width: 1200px; 
-            margin: 0 auto; 
-            padding: 20px;
-            background: rgba(255,255,255,0.95);
-            margin-top: 20px;
-            border-radius: 20px;
-            box-shadow: 0 20px 40px rgba(0,0,0,0.1);
-        }}
-        .header {{ 
-            text-align: center; 
-            margin-bottom: 30px; 
-            padding: 20px;
-            background: linear-gradient(45deg, #ff6b6b, #4ecdc4);
-            border-radius: 15px;
-            color: white;
-        }}
-        .server-info {{
-            background: #f8f9fa;
-            padding: 15px;
-            border-radius: 10px;
-            margin-bottom: 20px;
-            border-left: 4px solid #007bff;
-        }}
-        .upload-area {{ 
-            border: 3px dashed #007bff; 
-            padding: 60px 40px; 
-            text-align: center; 
-            margin: 30px 0; 
-            border-radius: 15px;
-            background: #f8f9fa;
-            transition: all 0.3s ease;
-            cursor: pointer;
-        }}
-        .upload-area:hover {{ 
-            border-color: #0056b3; 
-            background: #e9ecef; 
-            transform: translateY(-2px);
-        }}
-        .upload-area.dragover {{ 
-            border-color: #28a745; 
-            background: #d4edda; 
-            transform: scale(1.02);
-        }}
-        .upload-btn {{ 
-            background: linear-gradient(45deg, #007bff, #0056b3); 
-            color: white; 
-            border: none; 
-            padding: 15px 30px; 
-            border-radius: 25px; 
-            cursor: pointer; 
-            font-size: 16px; 
-            font-weight: bold;
-            transition: all 0.3s ease;
-            box-shadow: 0 4px 15px rgba(0,123,255,0.3);
-        }}
-        .upload-btn:hover {{ 
-            transform: translateY(-2px); 
-            box-shadow: 0 6px 20px rgba(0,123,255,0.4);
-        }}
-        .upload-btn:disabled {{ 
-            background: #ccc; 
-            cursor: not-allowed; 
-            transform: none;
-            box-shadow: none;
-        }}
-        .file-upload-item {{
-            background: white;
-            margin: 20px 0;
-            border-radius: 15px;
-            box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-            overflow: hidden;
-            border: 1px solid #e9ecef;
-        }}
-        .file-header {{
-            padding: 20px;
-            background: linear-gradient(45deg, #f8f9fa, #e9ecef);
-            border-bottom: 1px solid #dee2e6;
-        }}
-        .file-name {{
-            font-size: 18px;
-            font-weight: bold;
-            color: #333;
-            margin-bottom: 5px;
-        }}
-        .file-size {{
-            color: #666;
-            font-size: 14px;
-        }}
-        .progress-section {{
-            padding: 20px;
-        }}
-        .progress-bar {{ 
-            width: 100%; 
-            height: 25px; 
-            background: #e9ecef; 
-            border-radius: 15px; 
-            overflow: hidden;
-            margin-bottom: 15px;
-            position: relative;
-        }}
-        .progress-fill {{ 
-            height: 100%; 
-            background: linear-gradient(45deg, #28a745, #20c997); 
-            transition: width 0.5s ease;
-            border-radius: 15px;
-            position: relative;
-            overflow: hidden;
-        }}
-        .progress-fill::after {{
-            content: '';
-            position: absolute;
-            top: 0;
-            left: 0;
-            right: 0;
-            bottom: 0;
-            background: linear-gradient(45deg, transparent 25%, rgba(255,255,255,0.2) 25%, rgba(255,255,255,0.2) 50%, transparent 50%, transparent 75%, rgba(255,255,255,0.2) 75%);
-            background-size: 20px 20px;
-            animation: progress-animation 1s linear infinite;
-        }}
-        @keyframes progress-animation {{
-            0% {{ transform: translateX(-20px); }}
-            100% {{ transform: translateX(20px); }}
-        }}
-        .progress-text {{
-            position: absolute;
-            width: 100%;
-            text-align: center;
-            line-height: 25px;
-            font-weight: bold;
-            color: white;
-            text-shadow: 1px 1px 2px rgba(0,0,0,0.5);
-        }}
-        .stats {{ 
-            display: grid; 
-            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); 
-            gap: 15px; 
-            margin: 20px 0; 
-        }}
-        .stat-card {{ 
-            background: linear-gradient(135deg, #667eea, #764ba2); 
-            padding: 20px; 
-            border-radius: 15px; 
-            text-align: center;
-            color: white;
-            box-shadow: 0 5px 15px rgba(102,126,234,0.3);
-        }}
-        .stat-value {{ 
-            font-size: 28px; 
-            font-weight: bold; 
-            margin-bottom: 5px;
-        }}
-        .stat-label {{ 
-            font-size: 14px; 
-            opacity: 0.9;
-        }}
-        .status {{
-            padding: 10px 20px;
-            border-radius: 25px;
-            font-weight: bold;
-            text-align: center;
-            margin-top: 15px;
-        }}
-        .status.uploading {{
-            background: #fff3cd;
-            color: #856404;
-            border: 1px solid #ffeaa7;
-        }}
-        .status.success {{
-            background: #d4edda;
-            color: #155724;
-            border: 1px solid #c3e6cb;
-        }}
-        .status.error {{
-            background: #f8d7da;
-            color: #721c24;
-            border: 1px solid #f5c6cb;
-        }}
-        .network-info {{
-            background: linear-gradient(45deg, #ff6b6b, #ee5a24);
-            color: white;
-            padding: 15px;
-            border-radius: 10px;
-            margin: 20px 0;
-            text-align: center;
-        }}
-        .upload-icon {{
-            font-size: 48px;
-            margin-bottom: 15px;
-            color: #007bff;
-        }}
-        .speed-indicator {{
-            display: inline-block;
-            padding: 5px 15px;
-            background: #28a745;
-            color: white;
-            border-radius: 20px;
-            font-size: 12px;
-            font-weight: bold;
-            margin-left: 10px;
-        }}
-        .eta {{
-            font-size: 14px;
-            color: #666;
-            margin-top: 10px;
-        }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h1>🚀 Ultra Fast Video Upload Server</h1>
-            <p>Upload large video files at maximum speed with real-time progress tracking</p>
-        </div>
-        
-        
-        <div class="upload-area" id="uploadArea">
-            <div class="upload-icon">📁</div>
-            <h3>Drop your video files here</h3>
-            <p>Or click to select files from your computer</p>
-            <input type="file" id="fileInput" accept="video/*" multiple style="display: none;">
-            <br><br>
-            <button class="upload-btn" onclick="document.getElementById('fileInput').click()">
-                📂 Select Video Files
-            </button>
-        </div>
-        
-        <div id="uploadsList"></div>
-    </div>
-    
-    <script>
-        const uploadArea = document.getElementById('uploadArea');
-        const fileInput = document.getElementById('fileInput');
-        const uploadsList = document.getElementById('uploadsList');
-        
-        // Drag and drop functionality
-        uploadArea.addEventListener('dragover', (e) => {{
-            e.preventDefault();
-            uploadArea.classList.add('dragover');
-        }});
-        
-        uploadArea.addEventListener('dragleave', () => {{
-            uploadArea.classList.remove('dragover');
-        }});
-        
-        uploadArea.addEventListener('drop', (e) => {{
-            e.preventDefault();
-            uploadArea.classList.remove('dragover');
-            handleFiles(e.dataTransfer.files);
-        }});
-        
-        fileInput.addEventListener('change', (e) => {{
-            handleFiles(e.target.files);
-        }});
-        
-        function handleFiles(files) {{
-            // Accept all file types - no filtering needed
-            for (let file of files) {{
-                uploadFile(file);
-            }}
-        }}
-        function getFileIcon(filename) {{
-            const ext = filename.split('.').pop().toLowerCase();
-            
-            // Video files
-            if (['mp4', 'avi', 'mkv', 'mov', 'wmv', 'flv', 'webm', 'm4v'].includes(ext)) {{
-                return '🎬';
-            }}
-            // Image files
-            if (['jpg', 'jpeg', 'png', 'gif', 'bmp', 'tiff', 'svg', 'webp'].includes(ext)) {{
-                return '🖼️';
-            }}
-            // Audio files
-            if (['mp3', 'wav', 'flac', 'aac', 'ogg', 'wma'].includes(ext)) {{
-                return '🎵';
-            }}
-            // Document files
-            if (['pdf', 'doc', 'docx', 'txt', 'rtf', 'odt'].includes(ext)) {{
-                return '📄';
-            }}
-            // Archive files
-            if (['zip', 'rar', '7z', 'tar', 'gz'].includes(ext)) {{
-                return '📦';
-            }}
-            // Code files
-            if (['js', 'py', 'html', 'css', 'json', 'xml', 'sql', 'php', 'java', 'cpp', 'c'].includes(ext)) {{
-                return '💻';
-            }}
-            // Data files
-            if (['csv', 'xls', 'xlsx', 'db'].includes(ext)) {{
-                return '📊';
-            }}
-            // Design files
-            if (['psd', 'ai', 'sketch', 'fig'].includes(ext)) {{
-                return '🎨';
-            }}
-            
-            // Default file icon
-            return '📁';
-        }}
-        
-        async function uploadFile(file) {{
-            const uploadId = generateUploadId();
-            const chunkSize = 16 * 1024 * 1024; // 16MB chunks
-            const totalChunks = Math.ceil(file.size / chunkSize);
-            
-            // Create upload UI
-            const uploadDiv = createUploadUI(uploadId, file.name, file.size);
-            uploadsList.appendChild(uploadDiv);
-            
-            try {{
-                // Start upload session
-                await fetch('/start-upload', {{
-                    method: 'POST',
-                    headers: {{'Content-Type': 'application/json'}},
-                    body: JSON.stringify({{
-                        upload_id: uploadId,
-                        filename: file.name,
-                        total_size: file.size,
-                        total_chunks: totalChunks
-                    }})
-                }});
-                
-                updateStatus(uploadId, 'Uploading chunks...', 'uploading');
-                
-                // Upload chunks with maximum parallelism
-                const maxConcurrent = 6; // Optimal for most connections
-                const semaphore = new Semaphore(maxConcurrent);
-                const chunkPromises = [];
-                
-                for (let chunkIndex = 0; chunkIndex < totalChunks; chunkIndex++) {{
-                    const start = chunkIndex * chunkSize;
-                    const end = Math.min(start + chunkSize, file.size);
-                    const chunk = file.slice(start, end);
-                    
-                    chunkPromises.push(
-                        semaphore.acquire().then(async (release) => {{
-                            try {{
-                                await uploadChunk(uploadId, chunkIndex, chunk, totalChunks);
-                            }} finally {{
-                                release();
-                            }}
-                        }})
-                    );
-                }}
-                
-                await Promise.all(chunkPromises);
-                
-                updateStatus(uploadId, 'Completing upload...', 'uploading');
-                
-                // Complete upload
-                const completeResponse = await fetch(`/complete-upload/${{uploadId}}`, {{method: 'POST'}});
-                const completeResult = await completeResponse.json();
-                
-                updateStatus(uploadId, `✅ Upload completed successfully! Saved as: ${{completeResult.filename}}`, 'success');
-                
-            }} catch (error) {{
-                updateStatus(uploadId, `❌ Upload failed: ${{error.message}}`, 'error');
-                console.error('Upload error:', error);
-            }}
-        }}
-        
-        async function uploadChunk(uploadId, chunkIndex, chunk, totalChunks) {{
-            const formData = new FormData();
-            formData.append('chunk', chunk);
-            formData.append('chunk_index', chunkIndex);
-            formData.append('total_chunks', totalChunks);
-            
-            const response = await fetch(`/upload-chunk/${{uploadId}}`, {{
-                method: 'POST',
-                body: formData
-            }});
-            
-            if (!response.ok) {{
-                throw new Error(`Chunk ${{chunkIndex}} upload failed: ${{response.status}}`);
-            }}
-        }}
-        
-        function createUploadUI(uploadId, filename, fileSize) {{
-            const div = document.createElement('div');
-            div.className = 'file-upload-item';
-            div.id = `upload-${{uploadId}}`;
-            
-            div.innerHTML = `
-                <div class="file-header">
-                    <div class="file-name">🎬 ${{filename}}</div>
-                    <div class="file-size">📦 Size: ${{formatBytes(fileSize)}}</div>
-                </div>
-                <div class="progress-section">
-                    <div class="progress-bar">
-                        <div class="progress-fill" id="progress-${{uploadId}}" style="width: 0%"></div>
-                        <div class="progress-text" id="progress-text-${{uploadId}}">0%</div>
-                    </div>
-                    <div class="stats">
-                        <div class="stat-card">
-                            <div class="stat-value" id="speed-${{uploadId}}">0 MB/s</div>
-                            <div class="stat-label">🚀 Upload Speed</div>
-                        </div>
-                        <div class="stat-card">
-                            <div class="stat-value" id="uploaded-${{uploadId}}">0 MB</div>
-                            <div class="stat-label">📤 Uploaded</div>
-                        </div>
-                        <div class="stat-card">
-                            <div class="stat-value" id="chunks-${{uploadId}}">0/0</div>
-                            <div class="stat-label">🧩 Chunks</div>
-                        </div>
-                        <div class="stat-card">
-                            <div class="stat-value" id="eta-${{uploadId}}">--:--</div>
-                            <div class="stat-label">⏱️ ETA</div>
-                        </div>
-                    </div>
-                    <div class="status uploading" id="status-${{uploadId}}">Initializing upload...</div>
-                </div>
-            `;
-            
-            // Start progress monitoring
-            monitorProgress(uploadId);
-            
-            return div;
-        }}
-        
-        function monitorProgress(uploadId) {{
-            const interval = setInterval(async () => {{
-                try {{
-                    const response = await fetch(`/progress/${{uploadId}}`);
-                    if (response.ok) {{
-                        const progress = await response.json();
-                        updateProgressUI(uploadId, progress);
-                        
-                        if (progress.status === 'completed') {{
-                            clearInterval(interval);
-                        }}
-                    }}
-                }} catch (error) {{
-                    console.error('Progress monitoring error:', error);
-                }}
-            }}, 200); // Update every 200ms for smooth progress
-        }}
-        
-        function updateProgressUI(uploadId, progress) {{
-            document.getElementById(`progress-${{uploadId}}`).style.width = `${{progress.progress_percent}}%`;
-            document.getElementById(`progress-text-${{uploadId}}`).textContent = `${{progress.progress_percent}}%`;
-            document.getElementById(`speed-${{uploadId}}`).innerHTML = `${{progress.speed_mb_s}}<span class="speed-indicator">${{progress.speed_mbps}} Mbps</span>`;
-            document.getElementById(`uploaded-${{uploadId}}`).textContent = formatBytes(progress.uploaded_size);
-            document.getElementById(`chunks-${{uploadId}}`).textContent = `${{progress.received_chunks}}/${{progress.total_chunks}}`;
-            
-            // Format ETA
-            if (progress.eta_seconds > 0) {{
-                const eta = formatTime(progress.eta_seconds);
-                document.getElementById(`eta-${{uploadId}}`).textContent = eta;
-            }} else {{
-                document.getElementById(`eta-${{uploadId}}`).textContent = 'Complete';
-            }}
-        }}
-        
-        function updateStatus(uploadId, message, className) {{
-            const statusElement = document.getElementById(`status-${{uploadId}}`);
-            statusElement.textContent = message;
-            statusElement.className = `status ${{className}}`;
-        }}
-        
-        function generateUploadId() {{
-            return Date.now().toString(36) + Math.random().toString(36).substr(2);
-        }}
-        
-        function formatBytes(bytes) {{
-            if (bytes === 0) return '0 B';
-            const k = 1024;
-            const sizes = ['B', 'KB', 'MB', 'GB', 'TB'];
-            const i = Math.floor(Math.log(bytes) / Math.log(k));
-            return parseFloat((bytes / Math.pow(k, i)).toFixed(2)) + ' ' + sizes[i];
-        }}
-        
-        function formatTime(seconds) {{
-            if (seconds < 60) return `${{Math.round(seconds)}}s`;
-            const minutes = Math.floor(seconds / 60);
-            const remainingSeconds = Math.round(seconds % 60);
-            if (minutes < 60) return `${{minutes}}m ${{remainingSeconds}}s`;
-            const hours = Math.floor(minutes / 60);
-            const remainingMinutes = minutes % 60;
-            return `${{hours}}h ${{remainingMinutes}}m`;
-        }}
-        
-        class Semaphore {{
-            constructor(max) {{
-                this.max = max;
-                this.current = 0;
-                this.queue = [];
-            }}
-            
-            acquire() {{
-                return new Promise((resolve) => {{
-                    if (this.current < this.max) {{
-                        this.current++;
-                        resolve(() => this.release());
-                    }} else {{
-                        this.queue.push(() => {{
-                            this.current++;
-                            resolve(() => this.release());
-                        }});
-                    }}
-                }});
-            }}
-            
-            release() {{
-                this.current--;
-                if (this.queue.length > 0) {{
-                    const next = this.queue.shift();
-                    next();
-                }}
-            }}
-        }}
-        
-        // Show network info on page load
-        console.log('🚀 Ultra Fast Video Upload Server Ready!');
-        console.log('📡 Access from other devices using: http://{local_ip}:8000');
-    </script>
-</body>
-</html>
-    """
+async def read_chunk_batch(chunk_files):
+    batch = []
+    for chunk_file in chunk_files:
+        chunk_volume = volume_manager.volume_for(chunk_file)
+        batch.append(io_engine.read_file(chunk_volume, chunk_file))
+    return await asyncio.gather(*batch)
+
+async def assemble_chunks(volume: StorageVolume, final_path: str, chunk_files):
+    """Write chunks into final_path in batches, reading the next batch while the current one is written"""
+    for chunk_index, chunk_file in enumerate(chunk_files):
+        if not chunk_file or not os.path.exists(chunk_file):
+            raise HTTPException(status_code=500, detail=f"Missing chunk {chunk_index}")
+    
+    batches = [chunk_files[i:i + ASSEMBLY_BATCH_CHUNKS] for i in range(0, len(chunk_files), ASSEMBLY_BATCH_CHUNKS)]
+    handle = await io_engine.open_file(volume, final_path)
+    next_read = None
+    try:
+        offset = 0
+        if batches:
+            next_read = asyncio.ensure_future(read_chunk_batch(batches[0]))
+        for batch_index in range(len(batches)):
+            buffers = await next_read
+            if batch_index + 1 < len(batches):
+                next_read = asyncio.ensure_future(read_chunk_batch(batches[batch_index + 1]))
+            write_start = time.perf_counter()
+            new_offset = await io_engine.write_at(volume, handle, buffers, offset)
+            volume.record_write(new_offset - offset, time.perf_counter() - write_start)
+            offset = new_offset
+    finally:
+        if next_read is not None and not next_read.done():
+            next_read.cancel()
+        await io_engine.close_file(volume, handle)
+
+FRAME_INDEX_SUFFIX = ".frames.json"
+FRAME_INDEX_XATTR = "user.frame_index"  # Set on local files that can only be read through their index
+NONCE_SIZE = 12
+
+def load_encryption_key(path: str = ENCRYPTION_KEY_FILE):
+    if not os.path.exists(path):
+        print(f"⚠️  Generating a new encryption key at {os.path.abspath(path)} - back it up, files are unreadable without it")
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        try:
+            os.write(fd, os.urandom(32))
+        finally:
+            os.close(fd)
+    with open(path, 'rb') as f:
+        key = f.read()
+    if len(key) != 32:
+        raise ValueError(f"{path} must contain exactly 32 bytes")
+    return key
+
+class ChunkEncryptor:
+    """AES-256-GCM per chunk; a frame is nonce || ciphertext || tag, bound to its file and position"""
+    
+    def __init__(self, key: bytes, threads: int = ENCRYPTION_THREADS):
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        self.aead = AESGCM(key)
+        # OpenSSL releases the GIL, so a pool gets hardware AES on every core
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="crypto")
+    
+    def _aad(self, file_id: bytes, index: int):
+        return file_id + struct.pack(">Q", index)
+    
+    def _encrypt(self, file_id: bytes, index: int, data: bytes):
+        nonce = os.urandom(NONCE_SIZE)
+        return nonce + self.aead.encrypt(nonce, data, self._aad(file_id, index))
+    
+    def _decrypt(self, file_id: bytes, index: int, frame: bytes):
+        return self.aead.decrypt(frame[:NONCE_SIZE], frame[NONCE_SIZE:], self._aad(file_id, index))
+    
+    async def encrypt(self, file_id: bytes, index: int, data: bytes):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._encrypt, file_id, index, data)
+    
+    async def decrypt(self, file_id: bytes, index: int, frame: bytes):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._decrypt, file_id, index, frame)
+
+_encryptor = None
+
+def get_encryptor():
+    global _encryptor
+    if _encryptor is None:
+        _encryptor = ChunkEncryptor(load_encryption_key())
+    return _encryptor
+
+ZSTD_SKIPPABLE_MAGIC = 0x184D2A50
+ZSTD_SKIPPABLE_HEADER_SIZE = 8
+
+class ChunkCompressor:
+    """zstd with one independent frame per chunk, so any frame decompresses on its own"""
+    
+    def __init__(self, level: int = COMPRESSION_LEVEL, threads: int = COMPRESSION_THREADS):
+        import zstandard
+        self.zstandard = zstandard
+        self.level = level
+        self.local = threading.local()
+        # python-zstandard releases the GIL, so threads compress in parallel without pickling chunks
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="zstd")
+    
+    def _codecs(self):
+        # Compressor objects are not thread safe, keep one pair per thread
+        if not hasattr(self.local, 'compressor'):
+            self.local.compressor = self.zstandard.ZstdCompressor(level=self.level)
+            self.local.decompressor = self.zstandard.ZstdDecompressor()
+        return self.local.compressor, self.local.decompressor
+    
+    def _pays_off(self, original_size: int, compressed_size: int):
+        return compressed_size <= original_size * (1 - COMPRESSION_MIN_SAVING)
+    
+    def _is_compressible(self, data: bytes):
+        sample = data[:COMPRESSION_SAMPLE_SIZE]
+        compressor, _ = self._codecs()
+        return self._pays_off(len(sample), len(compressor.compress(sample)))
+    
+    def _compress(self, data: bytes):
+        compressor, _ = self._codecs()
+        frame = compressor.compress(data)
+        return frame if self._pays_off(len(data), len(frame)) else None
+    
+    def _decompress(self, frame: bytes):
+        _, decompressor = self._codecs()
+        return decompressor.decompress(frame)
+    
+    @staticmethod
+    def pad_frame(frame: bytes, size: int):
+        """Pad with a zstd skippable frame, which decoders ignore, up to at least size bytes"""
+        padding = max(size - len(frame) - ZSTD_SKIPPABLE_HEADER_SIZE, 0)
+        return frame + struct.pack("<II", ZSTD_SKIPPABLE_MAGIC, padding) + bytes(padding)
+    
+    async def is_compressible(self, data: bytes):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._is_compressible, data)
+    
+    async def compress(self, data: bytes):
+        """zstd frame for data, or None when compressing it would not pay off"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._compress, data)
+    
+    async def decompress(self, frame: bytes):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._decompress, frame)
+
+_compressor = None
+
+def get_compressor():
+    global _compressor
+    if _compressor is None:
+        _compressor = ChunkCompressor()
+    return _compressor
+
+def needs_frame_index(upload_info: dict):
+    # Known from the start (encrypted, or compression requested) so backends can mark the file up front
+    return bool(upload_info.get('file_id')) or 'compression_sampled' in upload_info
+
+def build_frame_index(upload_info: dict):
+    """Frame table stored next to a transformed file so ranges can be read without the rest of it"""
+    frames = [list(upload_info['frames'][i]) for i in range(upload_info['total_chunks'])]
+    return {
+        "version": 1,
+        "encryption": "aes-256-gcm" if upload_info.get('file_id') else None,
+        "file_id": upload_info['file_id'].hex() if upload_info.get('file_id') else None,
+        "plain_size": sum(frame[0] for frame in frames),
+        "frames": frames
+    }
+
+class FrameIndex:
+    def __init__(self, index: dict):
+        self.encryption = index.get("encryption")
+        self.file_id = bytes.fromhex(index["file_id"]) if index.get("file_id") else None
+        self.plain_size = index["plain_size"]
+        self.frames = index["frames"]
+        # Cumulative offsets so a plaintext position maps to its frame with a bisect
+        self.plain_offsets = []
+        self.stored_offsets = []
+        plain_offset = stored_offset = 0
+        for frame in self.frames:
+            plain_size, stored_size = frame[0], frame[1]
+            self.plain_offsets.append(plain_offset)
+            self.stored_offsets.append(stored_offset)
+            plain_offset += plain_size
+            stored_offset += stored_size
+    
+    def frame_at(self, position: int):
+        return bisect.bisect_right(self.plain_offsets, position) - 1
+    
+    async def decode(self, frame_number: int, stored: bytes):
+        data = stored
+        if self.encryption:
+            data = await get_encryptor().decrypt(self.file_id, frame_number, data)
+        frame = self.frames[frame_number]
+        if len(frame) > 2 and frame[2] == "zstd":
+            data = await get_compressor().decompress(data)
+        return data
+
+class LocalStorageBackend:
+    """Chunks are staged on the temp volumes and assembled into a file on an upload volume"""
+    name = "local"
+    uses_local_disk = True
+    min_part_size = 0
+    
+    def __init__(self):
+        self.claimed_names = set()  # Names being assembled, not yet on disk
+    
+    def _claim_name(self, filename: str):
+        """Unique name across the upload volumes, claimed without awaiting so concurrent completions differ"""
+        final_name = filename
+        counter = 1
+        base_name, ext = os.path.splitext(filename)
+        while final_name in self.claimed_names or any(
+            os.path.exists(os.path.join(v.path, final_name)) for v in volume_manager.upload_volumes
+        ):
+            final_name = f"{base_name}_{counter}{ext}"
+            counter += 1
+        self.claimed_names.add(final_name)
+        return final_name
+    
+    async def start_upload(self, upload_id: str, upload_info: dict):
+        # Without striping the whole upload is staged on one temp volume
+        if STRIPE_CHUNKS:
+            temp_volumes = volume_manager.temp_volumes
+        else:
+            temp_volumes = [volume_manager.pick(volume_manager.temp_volumes, upload_info['total_size'])]
+        upload_info['temp_volumes'] = temp_volumes
+        
+        # Create chunk directories
+        for volume in temp_volumes:
+            chunk_dir = os.path.join(volume.path, upload_id)
+            os.makedirs(chunk_dir, exist_ok=True)
+    
+    def chunk_dirs(self, upload_id: str):
+        return [os.path.join(volume.path, upload_id) for volume in volume_manager.temp_volumes]
+    
+    async def write_chunk(self, upload_id: str, upload_info: dict, chunk_index: int, chunk_data: bytes):
+        """Store a chunk and return where it was put"""
+        chunk_size = len(chunk_data)
+        temp_volumes = upload_info['temp_volumes']
+        if len(temp_volumes) == 1:
+            volume = temp_volumes[0]
+        else:
+            volume = volume_manager.pick(temp_volumes, chunk_size)
+        chunk_file = os.path.join(volume.path, upload_id, f"chunk_{chunk_index:06d}")
+        
+        volume.pending_bytes += chunk_size
+        try:
+            write_start = time.perf_counter()
+            await io_engine.write_file(volume, chunk_file, [chunk_data])
+            volume.record_write(chunk_size, time.perf_counter() - write_start)
+        finally:
+            volume.pending_bytes -= chunk_size
+        return chunk_file
+    
+    async def complete_upload(self, upload_id: str, upload_info: dict):
+        filename = upload_info['filename']
+        total_chunks = upload_info['total_chunks']
+        chunk_locations = upload_info['chunk_locations']
+        
+        # Place the final file on the upload volume with the most headroom
+        volume = volume_manager.pick(volume_manager.upload_volumes, upload_info['uploaded_size'])
+        
+        # Create unique filename if file already exists on any upload volume
+        final_name = self._claim_name(filename)
+        final_path = os.path.join(volume.path, final_name)
+        
+        volume.pending_bytes += upload_info['uploaded_size']
+        try:
+            # The index is durable before the file appears, so a transformed file never exists without it
+            if needs_frame_index(upload_info):
+                await self.write_index(final_path, build_frame_index(upload_info))
+            # Combine chunks into final file
+            await assemble_chunks(volume, final_path, [chunk_locations.get(i) for i in range(total_chunks)])
+        except Exception:
+            for path in (final_path, final_path + FRAME_INDEX_SUFFIX):
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+        finally:
+            volume.pending_bytes -= upload_info['uploaded_size']
+            self.claimed_names.discard(final_name)
+        if needs_frame_index(upload_info) and hasattr(os, "setxattr"):
+            try:
+                os.setxattr(final_path, FRAME_INDEX_XATTR, b"1")
+            except OSError:
+                pass  # No user xattrs on this filesystem, writing the index first still protects it
+        
+        # Clean up temporary chunks
+        for chunk_dir in self.chunk_dirs(upload_id):
+            try:
+                shutil.rmtree(chunk_dir)
+            except:
+                pass  # Don't fail if cleanup fails
+        
+        return {
+            "filename": final_name,
+            "file_size": os.path.getsize(final_path),
+            "location": final_path
+        }
+    
+    async def abort_upload(self, upload_id: str, upload_info: dict):
+        for chunk_dir in self.chunk_dirs(upload_id):
+            try:
+                if os.path.exists(chunk_dir):
+                    shutil.rmtree(chunk_dir)
+            except:
+                pass
+    
+    async def write_index(self, location: str, index: dict):
+        # Written like a final file, so close_file fsyncs it and its directory per DURABILITY
+        volume = volume_manager.upload_volume_for(location)
+        handle = await io_engine.open_file(volume, location + FRAME_INDEX_SUFFIX)
+        try:
+            await io_engine.write_at(volume, handle, [json.dumps(index).encode()], 0)
+        finally:
+            await io_engine.close_file(volume, handle)
+    
+    async def read_index(self, location: str):
+        index_path = location + FRAME_INDEX_SUFFIX
+        if not os.path.exists(index_path):
+            return None
+        volume = volume_manager.upload_volume_for(location)
+        return json.loads(await io_engine.read_file(volume, index_path))
+    
+    async def read_range(self, location: str, offset: int, length: int):
+        volume = volume_manager.upload_volume_for(location)
+        return await io_engine.read_at(volume, location, offset, length)
+    
+    async def find_file(self, filename: str):
+        # Plain names only: no separators of either kind, no dot entries and no index sidecars
+        if "/" in filename or "\\" in filename or filename in ("", ".", "..") or filename.endswith(FRAME_INDEX_SUFFIX):
+            return None
+        for volume in volume_manager.upload_volumes:
+            filepath = os.path.join(volume.path, filename)
+            if os.path.isfile(filepath):
+                stat = os.stat(filepath)
+                return {
+                    "filename": filename,
+                    "size": stat.st_size,
+                    "modified": stat.st_mtime,
+                    "location": filepath,
+                    "frame_index": self._has_index_marker(filepath)
+                }
+        return None
+    
+    def _has_index_marker(self, path: str):
+        if not hasattr(os, "getxattr"):
+            return False
+        try:
+            return os.getxattr(path, FRAME_INDEX_XATTR) == b"1"
+        except OSError:
+            return False
+    
+    async def list_files(self):
+        files = []
+        for volume in volume_manager.upload_volumes:
+            if not os.path.exists(volume.path):
+                continue
+            for filename in os.listdir(volume.path):
+                filepath = os.path.join(volume.path, filename)
+                if os.path.isfile(filepath) and not filename.endswith(FRAME_INDEX_SUFFIX):
+                    stat = os.stat(filepath)
+                    files.append({
+                        "filename": filename,
+                        "size": stat.st_size,
+                        "modified": stat.st_mtime,
+                        "location": filepath
+                    })
+        return files
+
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+S3_MAX_PARTS = 10000
+
+class S3StorageBackend:
+    """Each chunk goes from memory straight into a part of an S3 multipart upload, nothing is staged locally"""
+    name = "s3"
+    uses_local_disk = False
+    min_part_size = S3_MIN_PART_SIZE
+    
+    def __init__(self, bucket: str = S3_BUCKET, prefix: str = S3_PREFIX, endpoint_url: Optional[str] = S3_ENDPOINT_URL,
+                 region: Optional[str] = S3_REGION, max_concurrency: int = S3_MAX_CONCURRENCY):
+        import boto3
+        from botocore.config import Config
+        self.bucket = bucket
+        self.prefix = prefix
+        # boto3 clients are thread safe, one shared client keeps the connection pool warm
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            config=Config(max_pool_connections=max_concurrency)
+        )
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="s3")
+        self.claimed_names = {}  # Name -> upload_id, for uploads still in progress
+    
+    async def run(self, func, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, **kwargs))
+    
+    async def _head(self, key: str):
+        from botocore.exceptions import ClientError
+        try:
+            return await self.run(self.client.head_object, Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+    
+    async def _claim_name(self, upload_id: str, filename: str):
+        """Unique object name, with the same _1 suffixes as the local backend"""
+        name = filename
+        counter = 1
+        base_name, ext = os.path.splitext(filename)
+        while True:
+            if name in self.claimed_names:
+                await self._expire_claim(name)
+            if name not in self.claimed_names:
+                # Claim before the lookup so a concurrent upload of the same name moves on
+                self.claimed_names[name] = upload_id
+                if await self._head(self.prefix + name) is None:
+                    return name
+                self._release_name(upload_id, name)
+            name = f"{base_name}_{counter}{ext}"
+            counter += 1
+    
+    def _release_name(self, upload_id: str, name: str):
+        if self.claimed_names.get(name) == upload_id:
+            del self.claimed_names[name]
+    
+    async def _expire_claim(self, name: str):
+        """Take a name back from an upload idle longer than UPLOAD_IDLE_TIMEOUT"""
+        upload_id = self.claimed_names[name]
+        upload_info = upload_manager.active_uploads.get(upload_id)
+        if upload_info is None:
+            self._release_name(upload_id, name)
+        elif time.time() - upload_info['last_activity'] > UPLOAD_IDLE_TIMEOUT:
+            # Abandoned: abort it too, or it could still complete over the new object
+            upload_manager.active_uploads.pop(upload_id, None)
+            admission.release_upload(upload_id)
+            await self.abort_upload(upload_id, upload_info)
+    
+    async def start_upload(self, upload_id: str, upload_info: dict):
+        if upload_info['total_chunks'] > S3_MAX_PARTS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Too many chunks for object storage (max {S3_MAX_PARTS}), use larger chunks"
+            )
+        name = await self._claim_name(upload_id, upload_info['filename'])
+        key = self.prefix + name
+        # Marks objects that can only be read through their frame index
+        metadata = {"frame-index": "1"} if needs_frame_index(upload_info) else {}
+        try:
+            response = await self.run(self.client.create_multipart_upload, Bucket=self.bucket, Key=key, Metadata=metadata)
+        except Exception:
+            self._release_name(upload_id, name)
+            raise
+        upload_info['s3_name'] = name
+        upload_info['s3_key'] = key
+        upload_info['s3_upload_id'] = response['UploadId']
+        upload_info['s3_parts'] = {}
+    
+    async def write_chunk(self, upload_id: str, upload_info: dict, chunk_index: int, chunk_data: bytes):
+        # Object stores reject parts under 5 MB except the last one
+        if len(chunk_data) < S3_MIN_PART_SIZE and chunk_index != upload_info['total_chunks'] - 1:
+            raise HTTPException(status_code=400, detail=f"Chunks must be at least {S3_MIN_PART_SIZE // (1024**2)} MB")
+        part_number = chunk_index + 1
+        response = await self.run(
+            self.client.upload_part,
+            Bucket=self.bucket,
+            Key=upload_info['s3_key'],
+            UploadId=upload_info['s3_upload_id'],
+            PartNumber=part_number,
+            Body=chunk_data
+        )
+        upload_info['s3_parts'][part_number] = response['ETag']
+        return f"s3://{self.bucket}/{upload_info['s3_key']}#part={part_number}"
+    
+    async def complete_upload(self, upload_id: str, upload_info: dict):
+        parts = [{'PartNumber': number, 'ETag': etag} for number, etag in sorted(upload_info['s3_parts'].items())]
+        location = f"s3://{self.bucket}/{upload_info['s3_key']}"
+        # The index goes first, so the object never becomes visible without it
+        if needs_frame_index(upload_info):
+            await self.write_index(location, build_frame_index(upload_info))
+        await self.run(
+            self.client.complete_multipart_upload,
+            Bucket=self.bucket,
+            Key=upload_info['s3_key'],
+            UploadId=upload_info['s3_upload_id'],
+            MultipartUpload={'Parts': parts}
+        )
+        self._release_name(upload_id, upload_info['s3_name'])
+        return {
+            "filename": upload_info['s3_name'],
+            "file_size": sum(frame[1] for frame in upload_info['frames'].values()),
+            "location": location
+        }
+    
+    async def abort_upload(self, upload_id: str, upload_info: dict):
+        if 's3_upload_id' not in upload_info:
+            return
+        self._release_name(upload_id, upload_info['s3_name'])
+        try:
+            await self.run(
+                self.client.abort_multipart_upload,
+                Bucket=self.bucket,
+                Key=upload_info['s3_key'],
+                UploadId=upload_info['s3_upload_id']
+            )
+            await self.run(self.client.delete_object, Bucket=self.bucket, Key=upload_info['s3_key'] + FRAME_INDEX_SUFFIX)
+        except Exception:
+            pass  # Bucket lifecycle rules clean up anything left behind
+    
+    def _key(self, location: str):
+        return location[len(f"s3://{self.bucket}/"):]
+    
+    async def write_index(self, location: str, index: dict):
+        await self.run(
+            self.client.put_object,
+            Bucket=self.bucket,
+            Key=self._key(location) + FRAME_INDEX_SUFFIX,
+            Body=json.dumps(index).encode()
+        )
+    
+    async def read_index(self, location: str):
+        try:
+            response = await self.run(self.client.get_object, Bucket=self.bucket, Key=self._key(location) + FRAME_INDEX_SUFFIX)
+        except self.client.exceptions.NoSuchKey:
+            return None
+        return json.loads(await asyncio.get_running_loop().run_in_executor(self.executor, response['Body'].read))
+    
+    def _read_range(self, key: str, offset: int, length: int):
+        response = self.client.get_object(Bucket=self.bucket, Key=key, Range=f"bytes={offset}-{offset + length - 1}")
+        return response['Body'].read()
+    
+    async def read_range(self, location: str, offset: int, length: int):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._read_range, self._key(location), offset, length)
+    
+    async def find_file(self, filename: str):
+        # Names are unique directly under the prefix, one HEAD instead of listing the bucket
+        if "/" in filename or filename.endswith(FRAME_INDEX_SUFFIX):
+            return None
+        key = self.prefix + filename
+        response = await self._head(key)
+        if response is None:
+            return None
+        return {
+            "filename": filename,
+            "size": response['ContentLength'],
+            "modified": response['LastModified'].timestamp(),
+            "location": f"s3://{self.bucket}/{key}",
+            "frame_index": response.get('Metadata', {}).get("frame-index") == "1"
+        }
+    
+    def _list_objects(self):
+        files = []
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix, Delimiter="/"):
+            for item in page.get('Contents', []):
+                if item['Key'].endswith(FRAME_INDEX_SUFFIX):
+                    continue
+                files.append({
+                    "filename": item['Key'][len(self.prefix):],
+                    "size": item['Size'],
+                    "modified": item['LastModified'].timestamp(),
+                    "location": f"s3://{self.bucket}/{item['Key']}"
+                })
+        return files
+    
+    async def list_files(self):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._list_objects)
+
+def create_storage_backend(name: str):
+    if name == "s3":
+        return S3StorageBackend()
+    return LocalStorageBackend()
+
+storage = create_storage_backend(STORAGE_BACKEND)
+
+class AdmissionController:
+    def __init__(self, uploads: UploadManager):
+        self.uploads = uploads
+        self.inflight_bytes = 0
+        self.reservations = {}
+        self.rejected_requests = 0
+        self._memory_available = None
+        self._memory_checked = 0
+    
+    def memory_available(self):
+        # Sample at most once a second, psutil reads /proc on every call
+        now = time.monotonic()
+        if self._memory_available is None or now - self._memory_checked > 1:
+            import psutil
+            self._memory_available = psutil.virtual_memory().available
+            self._memory_checked = now
+        return self._memory_available
+    
+    def free_disk(self):
+        # Count each filesystem once even if several volumes share it
+        devices = {}
+        for volume in volume_manager.upload_volumes + volume_manager.temp_volumes:
+            devices[os.stat(volume.path).st_dev] = volume.free_space()
+        return sum(devices.values())
+    
+    def reserved_disk(self):
+        """Disk still owed to unfinished uploads: remaining chunks plus the final file"""
+        reserved = 0
+        now = time.time()
+        for upload_id, total_size in list(self.reservations.items()):
+            upload_info = self.uploads.active_uploads.get(upload_id)
+            if upload_info is None or now - upload_info['last_activity'] > UPLOAD_IDLE_TIMEOUT:
+                # Abandoned, stop holding disk for it
+                del self.reservations[upload_id]
+                continue
+            reserved += (total_size - upload_info['uploaded_size']) + total_size
+        return reserved
+    
+    def reserve_upload(self, upload_id: str, total_size: int):
+        self.release_upload(upload_id)
+        if not storage.uses_local_disk:
+            return
+        free = self.free_disk()
+        needed = 2 * total_size  # Chunks and the assembled file coexist until cleanup
+        if needed > free:
+            raise HTTPException(status_code=507, detail="Not enough disk space for this upload")
+        if needed > free - self.reserved_disk():
+            self.rejected_requests += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Disk space is reserved by other uploads, retry later",
+                headers={"Retry-After": "30"}
+            )
+        self.reservations[upload_id] = total_size
+    
+    def release_upload(self, upload_id: str):
+        self.reservations.pop(upload_id, None)
+    
+    def try_acquire_chunk(self, nbytes: int):
+        """Admit a chunk of nbytes, or return (status_code, detail, retry_after) to reject it"""
+        if self.inflight_bytes > 0 and self.inflight_bytes + nbytes > MAX_INFLIGHT_BYTES:
+            self.rejected_requests += 1
+            return 429, "Too many chunks in flight, retry later", 1
+        if self.memory_available() < MIN_FREE_MEMORY:
+            self.rejected_requests += 1
+            return 503, "Server is low on memory, retry later", 2
+        self.inflight_bytes += nbytes
+        return None
+    
+    def release_chunk(self, nbytes: int):
+        self.inflight_bytes -= nbytes
+    
+    def get_stats(self):
+        return {
+            'inflight_bytes': self.inflight_bytes,
+            'inflight_limit': MAX_INFLIGHT_BYTES,
+            'reserved_disk': f"{self.reserved_disk() / (1024**3):.2f} GB",
+            'reserved_uploads': len(self.reservations),
+            'rejected_requests': self.rejected_requests
+        }
+
+admission = AdmissionController(upload_manager)
+
+class AdmissionMiddleware:
+    """Admits or rejects each chunk before its multipart body is read, so rejected chunks cost nothing"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        # Plain ASGI, chunk bodies pass straight through without extra tasks or streams
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith("/upload-chunk/"):
+            return await self.app(scope, receive, send)
+        
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        nbytes = int(content_length) if content_length.isdigit() else CHUNK_SIZE
+        rejection = admission.try_acquire_chunk(nbytes)
+        if rejection:
+            status_code, detail, retry_after = rejection
+            response = JSONResponse(
+                status_code=status_code,
+                content={"detail": detail},
+                headers={"Retry-After": str(retry_after)}
+            )
+            return await response(scope, receive, send)
+        
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.release_chunk(nbytes)
+
+app.add_middleware(AdmissionMiddleware)
+
+# Enable CORS for all origins. Added after admission so it wraps it, and cross-origin
+# clients can read a 429/503 and its Retry-After instead of seeing a failed fetch
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["Retry-After"],
+)
+
+current_request = contextvars.ContextVar("current_request", default=None)
+
+class RequestContextMiddleware:
+    """Tags each request's task with its ASGI scope, so loop stalls can be traced back to a route"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        # Not reset afterwards: a request that never yields ends inside the same callback, and the
+        # monitor reads the variable once that callback returns. uvicorn gives each request its own task.
+        current_request.set(scope)
+        await self.app(scope, receive, send)
+
+# Added last so it wraps every other middleware
+app.add_middleware(RequestContextMiddleware)
+
+def route_label(scope: Optional[dict]):
+    if scope is None:
+        return None
+    # The router stores the matched endpoint in the scope, before that only the path is known
+    endpoint = scope.get("endpoint")
+    if endpoint is not None:
+        return endpoint.__name__
+    return f"{scope['method']} {scope['path']}"
+
+def callback_label(handle: asyncio.Handle):
+    callback = handle._callback
+    task = getattr(callback, '__self__', None)
+    if isinstance(task, asyncio.Task):
+        return task.get_coro().__qualname__
+    return getattr(callback, '__qualname__', type(callback).__name__)
+
+class LoopMonitor:
+    """Samples event loop lag and times every callback, attributing slow ones to the request they served"""
+    
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL, slow_threshold: float = SLOW_CALLBACK_THRESHOLD):
+        self.interval = interval
+        self.slow_threshold = slow_threshold
+        self.loop = None
+        self.thread_id = None
+        self.running = None  # Handle the loop is executing right now, read by the profiler
+        self.lag_samples = collections.deque(maxlen=max(int(60 / interval), 1))
+        self.max_lag = 0.0
+        self.slow_callbacks = collections.deque(maxlen=100)
+        self.slow_total = 0
+        self.routes = {}
+        self.task = None
+    
+    def install(self):
+        # Every callback, task step and timer on the asyncio loop goes through Handle._run
+        monitor = self
+        original_run = asyncio.Handle._run
+        
+        def timed_run(handle):
+            if handle._loop is not monitor.loop:
+                return original_run(handle)
+            monitor.running = handle
+            start = time.perf_counter()
+            try:
+                original_run(handle)
+            finally:
+                monitor.running = None
+                elapsed = time.perf_counter() - start
+                if elapsed >= monitor.slow_threshold:
+                    monitor.record_slow(handle, elapsed)
+        
+        asyncio.Handle._run = timed_run
+    
+    def record_slow(self, handle: asyncio.Handle, elapsed: float):
+        route = route_label(handle._context.get(current_request))
+        callback = callback_label(handle)
+        label = route or f"loop: {callback}"
+        elapsed_ms = elapsed * 1000
+        self.slow_total += 1
+        self.slow_callbacks.append({
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'duration_ms': round(elapsed_ms, 1),
+            'route': route,
+            'callback': callback
+        })
+        stats = self.routes.setdefault(label, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        stats['count'] += 1
+        stats['total_ms'] += elapsed_ms
+        stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+        print(f"🐢 Event loop blocked for {elapsed_ms:.0f} ms by {label}")
+    
+    async def sample_lag(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - start - self.interval, 0.0)
+            self.lag_samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+    
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.thread_id = threading.get_ident()
+        if self.slow_threshold > 0:
+            if isinstance(self.loop, asyncio.BaseEventLoop):
+                self.install()
+            else:
+                # uvloop runs callbacks in C, only lag sampling works there
+                print("🐢 Loop lag is sampled, run with --loop asyncio to trace slow callbacks to routes")
+        self.task = asyncio.ensure_future(self.sample_lag())
+    
+    def get_stats(self, detailed: bool = False):
+        samples = sorted(self.lag_samples)
+        
+        def percentile(p):
+            return round(samples[min(int(len(samples) * p), len(samples) - 1)] * 1000, 1) if samples else 0.0
+        
+        stats = {
+            'lag_ms': round(self.lag_samples[-1] * 1000, 1) if self.lag_samples else 0.0,
+            'lag_p50_ms': percentile(0.5),
+            'lag_p99_ms': percentile(0.99),
+            'max_lag_ms': round(self.max_lag * 1000, 1),
+            'slow_callbacks': self.slow_total
+        }
+        if detailed:
+            stats['slow_by_route'] = {
+                label: {'count': route['count'], 'total_ms': round(route['total_ms'], 1), 'max_ms': round(route['max_ms'], 1)}
+                for label, route in sorted(self.routes.items(), key=lambda item: -item[1]['total_ms'])
+            }
+            stats['recent_slow_callbacks'] = list(self.slow_callbacks)
+        return stats
+
+loop_monitor = LoopMonitor()
+app.add_event_handler("startup", loop_monitor.start)
+
+# Innermost frames of threads that are parked waiting for work
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+    ("queue.py", "get")
+}
+
+class SamplingProfiler:
+    """Samples every thread's stack from a background thread, output in collapsed (flamegraph) format"""
+    
+    def __init__(self, monitor: LoopMonitor):
+        self.monitor = monitor
+        self.active = False
+    
+    def _frame_label(self, frame):
+        code = frame.f_code
+        filename = code.co_filename
+        # Keep the package path for installed modules, routing.py alone is ambiguous
+        position = filename.rfind("site-packages" + os.sep)
+        filename = filename[position + 14:] if position >= 0 else os.path.basename(filename)
+        return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+    
+    def _is_idle(self, frame):
+        return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES
+    
+    def sample(self, seconds: float, interval: float, include_idle: bool = False):
+        counts = collections.Counter()
+        me = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            handle = self.monitor.running
+            for ident, frame in sys._current_frames().items():
+                if ident == me or (not include_idle and self._is_idle(frame)):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_label(frame))
+                    frame = frame.f_back
+                root = [names.get(ident, str(ident))]
+                if ident == self.monitor.thread_id and handle is not None:
+                    root.append(f"route: {route_label(handle._context.get(current_request)) or callback_label(handle)}")
+                counts[";".join(root + stack[::-1])] += 1
+            time.sleep(interval)
+        return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+profiler = SamplingProfiler(loop_monitor)
+
+def check_admin(request: Request):
+    token = request.headers.get("x-admin-token", "")
+    if ADMIN_TOKEN is None or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+class StaticBundle:
+    """Client assets built once at startup: content-hashed names, ETags and precompressed variants"""
+    
+    def __init__(self, source_dir: str, names):
+        try:
+            import brotli
+        except ImportError:
+            brotli = None
+        self.assets = {}  # served name -> asset
+        self.urls = {}  # source name -> content-hashed URL
+        for name in names:
+            with open(os.path.join(source_dir, name), 'rb') as f:
+                body = f.read()
+            # Point references at the hashed names of the assets built before this one
+            for source, url in self.urls.items():
+                body = body.replace(f"/static/{source}".encode(), url.encode())
+            digest = hashlib.sha256(body).hexdigest()[:16]
+            stem, ext = os.path.splitext(name)
+            served = name if name == STATIC_ENTRY else f"{stem}.{digest}{ext}"
+            variants = {"identity": body}
+            compressed = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                compressed["br"] = brotli.compress(body, quality=11)
+            for encoding, data in compressed.items():
+                if len(data) < len(body):
+                    variants[encoding] = data
+            self.assets[served] = {
+                "content_type": STATIC_TYPES.get(ext, "application/octet-stream"),
+                "etag": digest,
+                "variants": variants
+            }
+            self.urls[name] = f"/static/{served}"
+    
+    def negotiate(self, asset: dict, accept_encoding: str):
+        accepted = set()
+        for part in accept_encoding.lower().split(","):
+            coding, _, params = part.partition(";")
+            params = params.replace(" ", "")
+            try:
+                quality = float(params[2:]) if params.startswith("q=") else 1.0
+            except ValueError:
+                quality = 1.0
+            if quality > 0:
+                accepted.add(coding.strip())
+        for encoding in ("br", "gzip"):
+            if encoding in asset["variants"] and (encoding in accepted or "*" in accepted):
+                return encoding
+        return "identity"
+    
+    def response(self, name: str, request: Request, cache_control: str):
+        asset = self.assets.get(name)
+        if asset is None:
+            raise HTTPException(status_code=404, detail="Not found")
+        encoding = self.negotiate(asset, request.headers.get("accept-encoding", ""))
+        # Each encoding is its own representation, so it gets its own strong ETag
+        etag = f'"{asset["etag"]}"' if encoding == "identity" else f'"{asset["etag"]}-{encoding}"'
+        headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            if etag in tags or "*" in tags:
+                return Response(status_code=304, headers=headers)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(asset["variants"][encoding], media_type=asset["content_type"], headers=headers)
+
+static_bundle = StaticBundle(STATIC_DIR, STATIC_ASSETS + [STATIC_ENTRY])
+
+@app.get("/")
+async def upload_page(request: Request):
+    # The page itself is revalidated every load, a 304 costs a header compare
+    return static_bundle.response(STATIC_ENTRY, request, "no-cache")
+
+@app.get("/static/{name}")
+async def static_asset(name: str, request: Request):
+    # The page keeps its plain name and is only served from /, where it is revalidated
+    if name == STATIC_ENTRY:
+        raise HTTPException(status_code=404, detail="Not found")
+    # Names carry a content hash, so browsers can keep them until the hash changes
+    return static_bundle.response(name, request, f"public, max-age={STATIC_MAX_AGE}, immutable")
 
 @app.post("/start-upload")
 async def start_upload(request: Request):
@@ -669,7 +1724,10 @@ async def start_upload(request: Request):
     filename = data.get('filename')
     total_size = data.get('total_size')
     total_chunks = data.get('total_chunks')
+    compression = data.get('compression') or COMPRESSION_DEFAULT
     
+    if compression not in ("zstd", "none"):
+        raise HTTPException(status_code=400, detail=f"Unsupported compression: {compression}")
     if total_size > MAX_FILE_SIZE:
         raise HTTPException(status_code=413, detail=f"File too large. Maximum size is {MAX_FILE_SIZE // (1024**3)} GB")
     
@@ -678,7 +1736,24 @@ async def start_upload(request: Request):
     if not safe_filename:
         safe_filename = f"video_{int(time.time())}"
     
-    upload_manager.start_upload(upload_id, total_size, safe_filename, total_chunks)
+    admission.reserve_upload(upload_id, total_size)
+    try:
+        upload_info = upload_manager.start_upload(upload_id, total_size, safe_filename, total_chunks)
+        if ENCRYPT_AT_REST:
+            get_encryptor()
+            upload_info['file_id'] = os.urandom(16)
+        if compression == "zstd":
+            try:
+                get_compressor()
+            except ImportError:
+                raise HTTPException(status_code=400, detail="zstd compression is not available on this server")
+            upload_info['compression'] = "zstd"
+            upload_info['compression_sampled'] = False
+        await storage.start_upload(upload_id, upload_info)
+    except Exception:
+        admission.release_upload(upload_id)
+        upload_manager.active_uploads.pop(upload_id, None)
+        raise
     
     return {
         "status": "upload_started", 
@@ -687,39 +1762,126 @@ async def start_upload(request: Request):
         "chunk_size": CHUNK_SIZE
     }
 
+async def read_chunk_form(request: Request):
+    """Fields and chunk bytes of an upload-chunk form, parsed in memory as the body streams in.
+    
+    Starlette's form parser spools file parts over 1 MB to a temp file, which would put
+    plaintext chunks on local disk before encryption and stage S3 parts locally.
+    """
+    from multipart.multipart import MultipartParser, parse_options_header
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not params.get(b"boundary"):
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data body")
+    
+    fields = {}
+    part = {}
+    
+    def on_part_begin():
+        part.update(headers=[], name=None, data=bytearray())
+    
+    def on_header_field(data, start, end):
+        part['headers'].append([data[start:end], b""])
+    
+    def on_header_value(data, start, end):
+        part['headers'][-1][1] += data[start:end]
+    
+    def on_headers_finished():
+        for field, value in part['headers']:
+            if field.lower() == b"content-disposition":
+                part['name'] = parse_options_header(value)[1].get(b"name", b"").decode()
+    
+    def on_part_data(data, start, end):
+        part['data'] += data[start:end]
+    
+    def on_part_end():
+        if part['name']:
+            fields[part['name']] = part['data']
+    
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end
+    })
+    try:
+        async for data in request.stream():
+            parser.write(data)
+        parser.finalize()
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid multipart body: {e}")
+    
+    if "chunk" not in fields:
+        raise HTTPException(status_code=422, detail="Missing chunk")
+    try:
+        chunk_index = int(fields["chunk_index"])
+        total_chunks = int(fields["total_chunks"])
+    except (KeyError, ValueError):
+        raise HTTPException(status_code=422, detail="chunk_index and total_chunks must be integers")
+    chunk_sha256 = fields["chunk_sha256"].decode() if fields.get("chunk_sha256") else None
+    return fields["chunk"], chunk_index, total_chunks, chunk_sha256
+
 @app.post("/upload-chunk/{upload_id}")
-async def upload_chunk(
-    upload_id: str, 
-    chunk: UploadFile = File(...), 
-    chunk_index: int = Form(...),
-    total_chunks: int = Form(...)
-):
+async def upload_chunk(upload_id: str, request: Request):
     """Receive and store a chunk of the file"""
     
     if upload_id not in upload_manager.active_uploads:
         raise HTTPException(status_code=404, detail="Upload session not found")
     
+    # Read chunk data, held in memory until it is stored
+    chunk_data, chunk_index, total_chunks, chunk_sha256 = await read_chunk_form(request)
+    
     try:
-        # Read chunk data
-        chunk_data = await chunk.read()
         chunk_size = len(chunk_data)
         
-        # Save chunk to temporary file
-        chunk_dir = os.path.join(TEMP_DIR, upload_id)
-        chunk_file = os.path.join(chunk_dir, f"chunk_{chunk_index:06d}")
+        # Verify client checksum off the event loop (hashlib releases the GIL)
+        if chunk_sha256:
+            digest = await asyncio.to_thread(lambda: hashlib.sha256(chunk_data).hexdigest())
+            if digest != chunk_sha256.lower():
+                raise HTTPException(status_code=422, detail=f"Checksum mismatch for chunk {chunk_index}")
+        
+        upload_info = upload_manager.active_uploads[upload_id]
+        stored_data = chunk_data
+        codec = None
         
-        async with aiofiles.open(chunk_file, 'wb') as f:
-            await f.write(chunk_data)
+        # Compress into an independent frame, giving up on the whole upload if
+        # the first sample shows the data is already compressed (video, archives)
+        if upload_info.get('compression'):
+            compressor = get_compressor()
+            if not upload_info['compression_sampled']:
+                upload_info['compression_sampled'] = True
+                if not await compressor.is_compressible(chunk_data):
+                    upload_info['compression'] = None
+            if upload_info['compression']:
+                frame = await compressor.compress(chunk_data)
+                if frame is not None:
+                    # Object stores need every part but the last to be a minimum size
+                    if len(frame) < storage.min_part_size and chunk_index != upload_info['total_chunks'] - 1:
+                        frame = compressor.pad_frame(frame, storage.min_part_size)
+                    stored_data = frame
+                    codec = "zstd"
+        
+        # Encrypt before the chunk is stored, so no plaintext reaches the disk
+        if upload_info.get('file_id'):
+            stored_data = await get_encryptor().encrypt(upload_info['file_id'], chunk_index, stored_data)
+        
+        # Hand the chunk to the storage backend
+        location = await storage.write_chunk(upload_id, upload_info, chunk_index, stored_data)
         
         # Update progress
-        upload_manager.receive_chunk(upload_id, chunk_index, chunk_size)
+        upload_manager.receive_chunk(upload_id, chunk_index, chunk_size, location, len(stored_data), codec)
         
         return {
             "status": "chunk_received", 
             "chunk_index": chunk_index,
-            "chunk_size": chunk_size
+            "chunk_size": chunk_size,
+            "stored_size": len(stored_data),
+            "verified": bool(chunk_sha256)
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chunk upload failed: {str(e)}")
 
@@ -736,60 +1898,25 @@ async def complete_upload(upload_id: str):
         raise HTTPException(status_code=400, detail="Upload incomplete - missing chunks")
     
     try:
-        filename = upload_info['filename']
-        total_chunks = upload_info['total_chunks']
-        
-        # Create unique filename if file already exists
-        final_path = os.path.join(UPLOAD_DIR, filename)
-        counter = 1
-        base_name, ext = os.path.splitext(filename)
-        while os.path.exists(final_path):
-            new_filename = f"{base_name}_{counter}{ext}"
-            final_path = os.path.join(UPLOAD_DIR, new_filename)
-            counter += 1
-        
-        # Combine chunks into final file
-        chunk_dir = os.path.join(TEMP_DIR, upload_id)
-        
-        async with aiofiles.open(final_path, 'wb') as final_file:
-            for chunk_index in range(total_chunks):
-                chunk_file = os.path.join(chunk_dir, f"chunk_{chunk_index:06d}")
-                
-                if os.path.exists(chunk_file):
-                    async with aiofiles.open(chunk_file, 'rb') as cf:
-                        chunk_data = await cf.read()
-                        await final_file.write(chunk_data)
-                else:
-                    raise HTTPException(status_code=500, detail=f"Missing chunk {chunk_index}")
-        
-        # Clean up temporary chunks
-        try:
-            shutil.rmtree(chunk_dir)
-        except:
-            pass  # Don't fail if cleanup fails
+        result = await storage.complete_upload(upload_id, upload_info)
         
         upload_manager.complete_upload(upload_id)
+        admission.release_upload(upload_id)
         
-        # Get final file info
-        file_size = os.path.getsize(final_path)
-        
-        print(f"✅ Upload completed: {os.path.basename(final_path)} ({file_size / (1024**3):.2f} GB)")
+        file_size = result['file_size']
+        print(f"✅ Upload completed: {result['filename']} ({file_size / (1024**3):.2f} GB)")
         
         return {
             "status": "upload_completed",
-            "filename": os.path.basename(final_path),
+            "filename": result['filename'],
             "file_size": file_size,
-            "location": final_path
+            "location": result['location']
         }
         
     except Exception as e:
         # Clean up on error
-        try:
-            chunk_dir = os.path.join(TEMP_DIR, upload_id)
-            if os.path.exists(chunk_dir):
-                shutil.rmtree(chunk_dir)
-        except:
-            pass
+        admission.release_upload(upload_id)
+        await storage.abort_upload(upload_id, upload_info)
         
         raise HTTPException(status_code=500, detail=f"Upload completion failed: {str(e)}")
 
@@ -801,89 +1928,273 @@ async def get_progress(upload_id: str):
         raise HTTPException(status_code=404, detail="Upload not found")
     return progress
 
+DOWNLOAD_BLOCK_SIZE = 4 * 1024 * 1024
+frame_index_cache = {}
+
+async def load_frame_index(item: dict):
+    key = (item["location"], item["size"], item["modified"])
+    if key not in frame_index_cache:
+        index = await storage.read_index(item["location"])
+        if len(frame_index_cache) >= 64:
+            frame_index_cache.pop(next(iter(frame_index_cache)))
+        frame_index_cache[key] = FrameIndex(index) if index else None
+    return frame_index_cache[key]
+
+def parse_range(header: Optional[str], size: int):
+    """Single "bytes=" range as inclusive (start, end), or None for the whole file"""
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            start = max(size - int(last), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, min(end, size - 1)
+
+async def stream_raw(location: str, start: int, end: int):
+    position = start
+    while position <= end:
+        length = min(DOWNLOAD_BLOCK_SIZE, end + 1 - position)
+        yield await storage.read_range(location, position, length)
+        position += length
+
+async def stream_frames(location: str, index: FrameIndex, start: int, end: int):
+    # Only the frames overlapping the range are read and decoded
+    frame_number = index.frame_at(start)
+    while frame_number < len(index.frames) and index.plain_offsets[frame_number] <= end:
+        plain_size, stored_size = index.frames[frame_number][:2]
+        stored = await storage.read_range(location, index.stored_offsets[frame_number], stored_size)
+        plain = await index.decode(frame_number, stored)
+        frame_start = index.plain_offsets[frame_number]
+        yield plain[max(start - frame_start, 0):min(end + 1 - frame_start, plain_size)]
+        frame_number += 1
+
+@app.get("/download/{filename}")
+async def download_file(filename: str, request: Request):
+    """Download an uploaded file, with Range support; encrypted files are decrypted on the fly"""
+    if not PUBLIC_DOWNLOADS:
+        check_admin(request)
+    item = await storage.find_file(filename)
+    if item is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    index = await load_frame_index(item)
+    if index is None and item.get("frame_index"):
+        # Serving the stored bytes would hand out ciphertext or raw zstd as the file
+        raise HTTPException(status_code=500, detail="Frame index for this file is missing")
+    size = index.plain_size if index else item["size"]
+    byte_range = parse_range(request.headers.get("range"), size)
+    start, end = byte_range if byte_range else (0, size - 1)
+    
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(end + 1 - start if size else 0),
+        "Content-Disposition": f'attachment; filename="{filename}"'
+    }
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    
+    if size == 0:
+        body = iter(())
+    elif index:
+        body = stream_frames(item["location"], index, start, end)
+    else:
+        body = stream_raw(item["location"], start, end)
+    return StreamingResponse(
+        body,
+        status_code=206 if byte_range else 200,
+        media_type="application/octet-stream",
+        headers=headers
+    )
+
 @app.get("/uploads")
 async def list_uploads():
     """List all uploaded files"""
     uploads = []
-    if os.path.exists(UPLOAD_DIR):
-        for filename in os.listdir(UPLOAD_DIR):
-            filepath = os.path.join(UPLOAD_DIR, filename)
-            if os.path.isfile(filepath):
-                stat = os.stat(filepath)
-                uploads.append({
-                    "filename": filename,
-                    "size": stat.st_size,
-                    "size_formatted": f"{stat.st_size / (1024**3):.2f} GB" if stat.st_size > 1024**3 else f"{stat.st_size / (1024**2):.2f} MB",
-                    "modified": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(stat.st_mtime))
-                })
+    for item in await storage.list_files():
+        size = item["size"]
+        uploads.append({
+            "filename": item["filename"],
+            "size": size,
+            "size_formatted": f"{size / (1024**3):.2f} GB" if size > 1024**3 else f"{size / (1024**2):.2f} MB",
+            "modified": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(item["modified"])),
+            "location": item["location"]
+        })
     
     # Sort by modification time (newest first)
     uploads.sort(key=lambda x: x["modified"], reverse=True)
     return {"uploads": uploads, "total_files": len(uploads)}
 
+@app.get("/admin/profile")
+async def admin_profile(request: Request, seconds: float = 10, interval_ms: float = 5, idle: bool = False):
+    """Profile every thread for a number of seconds, returns collapsed stacks for flamegraph.pl or speedscope"""
+    check_admin(request)
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be between 0 and {PROFILE_MAX_SECONDS}")
+    if interval_ms < 1:
+        raise HTTPException(status_code=400, detail="interval_ms must be at least 1")
+    if profiler.active:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    
+    profiler.active = True
+    try:
+        loop = asyncio.get_running_loop()
+        folded = await loop.run_in_executor(None, profiler.sample, seconds, interval_ms / 1000, idle)
+    finally:
+        profiler.active = False
+    
+    return Response(
+        folded,
+        media_type="text/plain",
+        headers={"Content-Disposition": 'attachment; filename="profile.folded"'}
+    )
+
+@app.get("/admin/loop-lag")
+async def admin_loop_lag(request: Request):
+    """Event loop lag and the routes behind slow callbacks"""
+    check_admin(request)
+    return loop_monitor.get_stats(detailed=True)
+
+_local_ip = None
+
+def local_ip_address():
+    """LAN address of the default route, connecting a UDP socket sends nothing and needs no DNS lookup"""
+    global _local_ip
+    if _local_ip is None:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            try:
+                s.connect(("10.255.255.255", 1))
+                _local_ip = s.getsockname()[0]
+            except OSError:
+                _local_ip = "127.0.0.1"
+    return _local_ip
+
 @app.get("/server-stats")
 async def get_server_stats():
     """Get server statistics"""
     import psutil
-    import socket
     
     # Get system info
-    cpu_percent = psutil.cpu_percent(interval=1)
+    # Sampled over a second on a thread, so the stats call doesn't stall the loop it reports on
+    cpu_percent = await asyncio.to_thread(psutil.cpu_percent, 1)
     memory = psutil.virtual_memory()
-    disk = psutil.disk_usage(UPLOAD_DIR)
+    disk_used, disk_free = volume_manager.disk_usage(volume_manager.upload_volumes)
     
     # Get network info
     hostname = socket.gethostname()
-    local_ip = socket.gethostbyname(hostname)
+    local_ip = local_ip_address()
     
     # Count uploaded files
-    total_files = 0
-    total_size = 0
-    if os.path.exists(UPLOAD_DIR):
-        for filename in os.listdir(UPLOAD_DIR):
-            filepath = os.path.join(UPLOAD_DIR, filename)
-            if os.path.isfile(filepath):
-                total_files += 1
-                total_size += os.path.getsize(filepath)
+    files = await storage.list_files()
+    total_files = len(files)
+    total_size = sum(item["size"] for item in files)
     
     return {
         "server_info": {
             "hostname": hostname,
             "local_ip": local_ip,
-            "upload_directory": os.path.abspath(UPLOAD_DIR)
+            "upload_directories": [os.path.abspath(v.path) for v in volume_manager.upload_volumes]
         },
         "system_stats": {
             "cpu_usage": f"{cpu_percent}%",
             "memory_usage": f"{memory.percent}%",
             "memory_available": f"{memory.available / (1024**3):.1f} GB",
-            "disk_free": f"{disk.free / (1024**3):.1f} GB",
-            "disk_used": f"{disk.used / (1024**3):.1f} GB"
+            "disk_free": f"{disk_free / (1024**3):.1f} GB",
+            "disk_used": f"{disk_used / (1024**3):.1f} GB"
         },
         "upload_stats": {
             "total_files": total_files,
             "total_size": f"{total_size / (1024**3):.2f} GB",
             "active_uploads": len(upload_manager.active_uploads)
-        }
+        },
+        "storage_backend": storage.name,
+        "io_engine": io_engine.name,
+        "write_mode": WRITE_MODE,
+        "durability": DURABILITY,
+        "encryption": "aes-256-gcm" if ENCRYPT_AT_REST else None,
+        "volumes": volume_manager.get_stats(),
+        "admission": admission.get_stats(),
+        "event_loop": loop_monitor.get_stats()
     }
 
+async def flush_on_shutdown():
+    # uvicorn has already waited for in-flight chunks (up to SHUTDOWN_DRAIN_TIMEOUT)
+    io_engine.shutdown()
+    print("💾 Disk writes flushed, bye")
+
+app.add_event_handler("shutdown", flush_on_shutdown)
+
+def create_listen_socket(host: str, port: int, backlog: int, rcvbuf: Optional[int]):
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if rcvbuf:
+        # Set before listen() so accepted connections inherit it and the window scale can use it all
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        effective = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF) // 2  # Linux reports double
+        if effective < rcvbuf:
+            print(f"⚠️  Receive buffer capped at {effective} bytes, raise net.core.rmem_max for more")
+    sock.bind((host, port))
+    sock.listen(backlog)
+    return sock
+
+def resolve_loop(name: str):
+    if name != "auto":
+        return name
+    try:
+        import uvloop
+        return "uvloop"
+    except ImportError:
+        return "asyncio"
+
+def run_server():
+    import uvicorn
+    
+    class DrainingServer(uvicorn.Server):
+        def handle_exit(self, sig, frame):
+            if not self.should_exit:
+                print(f"⏳ Shutting down, draining {admission.inflight_bytes / (1024**2):.0f} MB of in-flight chunks")
+            super().handle_exit(sig, frame)
+    
+    loop = resolve_loop(SERVER_LOOP)
+    sock = create_listen_socket(SERVER_HOST, SERVER_PORT, SERVER_BACKLOG, SOCKET_RCVBUF)
+    config = uvicorn.Config(
+        app,  # The app object, a "main:app" string would import this module a second time
+        host=SERVER_HOST,
+        port=SERVER_PORT,
+        access_log=True,
+        # Performance optimizations
+        loop=loop,
+        http="httptools",
+        ws="none",
+        interface="asgi3",
+        backlog=SERVER_BACKLOG,
+        timeout_graceful_shutdown=SHUTDOWN_DRAIN_TIMEOUT,
+        log_level="info"
+    )
+    print(f"⚙️  Event loop: {loop}, backlog: {SERVER_BACKLOG}, receive buffer: {SOCKET_RCVBUF or 'autotuned'}")
+    DrainingServer(config).run(sockets=[sock])
+
 if __name__ == "__main__":
     print("=" * 60)
     print("🚀 ULTRA FAST VIDEO UPLOAD SERVER")
     print("=" * 60)
-    print(f"📁 Upload Directory: {os.path.abspath(UPLOAD_DIR)}")
-    print(f"🗂️  Temp Directory: {os.path.abspath(TEMP_DIR)}")
+    print(f"📁 Upload Directory: {', '.join(os.path.abspath(d) for d in UPLOAD_DIRS)}")
+    print(f"🗂️  Temp Directory: {', '.join(os.path.abspath(d) for d in TEMP_DIRS)}")
     print(f"📊 Max File Size: {MAX_FILE_SIZE // (1024**3)} GB")
     print(f"🧩 Chunk Size: {CHUNK_SIZE // (1024**2)} MB")
     print("-" * 60)
     
-    # Get network info
-    import socket
-    hostname = socket.gethostname()
-    local_ip = socket.gethostbyname(hostname)
-    
     print("🌐 ACCESS URLS:")
-    print(f"   Local: http://localhost:8000")
-    print(f"   Network: http://{local_ip}:8000")
+    print(f"   Local: http://localhost:{SERVER_PORT}")
+    print(f"   Network: http://{local_ip_address()}:{SERVER_PORT}")
     print("-" * 60)
     print("📋 FEATURES:")
     print("   ✅ Chunked uploads for reliability")
@@ -898,22 +2209,4 @@ if __name__ == "__main__":
     print("📱 Share the network URL with other devices")
     print("=" * 60)
     
-    # Create directories if they don't exist
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
-    os.makedirs(TEMP_DIR, exist_ok=True)
-    
-    # Run server with optimized settings
-    uvicorn.run(
-        "main:app", 
-        host="0.0.0.0",  # Allow access from network
-        port=8000, 
-        reload=False,
-        workers=1,
-        access_log=True,
-        # Performance optimizations
-        loop="asyncio",
-        http="httptools",
-        ws="none",
-        interface="asgi3",
-        log_level="info"
-    )
+    run_server()
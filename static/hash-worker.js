@@ -0,0 +1,74 @@
+// Chunk preparation worker: reads a slice of the file, hashes it and
+// hands the buffer back (transferred, not copied) ready to upload.
+const K = new Uint32Array([
+    0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+    0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+    0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+    0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+    0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+    0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+    0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+    0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2
+]);
+
+// Pure JS SHA-256 for pages served over plain http on the LAN,
+// where crypto.subtle is not available (non-secure context)
+function sha256Fallback(bytes) {
+    const H = new Uint32Array([
+        0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19
+    ]);
+    const W = new Uint32Array(64);
+    const length = bytes.length;
+    const fullBlocks = length - (length % 64);
+    const tail = new Uint8Array((length % 64) < 56 ? 64 : 128);
+    tail.set(bytes.subarray(fullBlocks));
+    tail[length % 64] = 0x80;
+    const tailView = new DataView(tail.buffer);
+    tailView.setUint32(tail.length - 8, Math.floor(length / 0x20000000));
+    tailView.setUint32(tail.length - 4, (length * 8) >>> 0);
+    
+    const compress = (data, offset) => {
+        const view = new DataView(data.buffer, data.byteOffset + offset, 64);
+        for (let i = 0; i < 16; i++) W[i] = view.getUint32(i * 4);
+        for (let i = 16; i < 64; i++) {
+            const w15 = W[i - 15], w2 = W[i - 2];
+            const s0 = ((w15 >>> 7) | (w15 << 25)) ^ ((w15 >>> 18) | (w15 << 14)) ^ (w15 >>> 3);
+            const s1 = ((w2 >>> 17) | (w2 << 15)) ^ ((w2 >>> 19) | (w2 << 13)) ^ (w2 >>> 10);
+            W[i] = (W[i - 16] + s0 + W[i - 7] + s1) | 0;
+        }
+        let a = H[0], b = H[1], c = H[2], d = H[3], e = H[4], f = H[5], g = H[6], h = H[7];
+        for (let i = 0; i < 64; i++) {
+            const S1 = ((e >>> 6) | (e << 26)) ^ ((e >>> 11) | (e << 21)) ^ ((e >>> 25) | (e << 7));
+            const t1 = (h + S1 + ((e & f) ^ (~e & g)) + K[i] + W[i]) | 0;
+            const S0 = ((a >>> 2) | (a << 30)) ^ ((a >>> 13) | (a << 19)) ^ ((a >>> 22) | (a << 10));
+            const t2 = (S0 + ((a & b) ^ (a & c) ^ (b & c))) | 0;
+            h = g; g = f; f = e; e = (d + t1) | 0;
+            d = c; c = b; b = a; a = (t1 + t2) | 0;
+        }
+        H[0] += a; H[1] += b; H[2] += c; H[3] += d;
+        H[4] += e; H[5] += f; H[6] += g; H[7] += h;
+    };
+    
+    for (let offset = 0; offset < fullBlocks; offset += 64) compress(bytes, offset);
+    for (let offset = 0; offset < tail.length; offset += 64) compress(tail, offset);
+    return Array.from(H, (word) => word.toString(16).padStart(8, '0')).join('');
+}
+
+async function sha256Hex(buffer) {
+    if (self.crypto && self.crypto.subtle) {
+        const digest = await self.crypto.subtle.digest('SHA-256', buffer);
+        return Array.from(new Uint8Array(digest), (b) => b.toString(16).padStart(2, '0')).join('');
+    }
+    return sha256Fallback(new Uint8Array(buffer));
+}
+
+self.onmessage = async (e) => {
+    const { id, file, start, end } = e.data;
+    try {
+        const buffer = await file.slice(start, end).arrayBuffer();
+        const hash = await sha256Hex(buffer);
+        self.postMessage({ id, buffer, hash }, [buffer]);
+    } catch (error) {
+        self.postMessage({ id, error: error.message });
+    }
+};
@@ -0,0 +1,385 @@
+const uploadArea = document.getElementById('uploadArea');
+const fileInput = document.getElementById('fileInput');
+const uploadsList = document.getElementById('uploadsList');
+
+// Drag and drop functionality
+uploadArea.addEventListener('dragover', (e) => {
+    e.preventDefault();
+    uploadArea.classList.add('dragover');
+});
+
+uploadArea.addEventListener('dragleave', () => {
+    uploadArea.classList.remove('dragover');
+});
+
+uploadArea.addEventListener('drop', (e) => {
+    e.preventDefault();
+    uploadArea.classList.remove('dragover');
+    handleFiles(e.dataTransfer.files);
+});
+
+fileInput.addEventListener('change', (e) => {
+    handleFiles(e.target.files);
+});
+
+function handleFiles(files) {
+    // Accept all file types - no filtering needed
+    for (let file of files) {
+        uploadFile(file);
+    }
+}
+function getFileIcon(filename) {
+    const ext = filename.split('.').pop().toLowerCase();
+    
+    // Video files
+    if (['mp4', 'avi', 'mkv', 'mov', 'wmv', 'flv', 'webm', 'm4v'].includes(ext)) {
+        return '🎬';
+    }
+    // Image files
+    if (['jpg', 'jpeg', 'png', 'gif', 'bmp', 'tiff', 'svg', 'webp'].includes(ext)) {
+        return '🖼️';
+    }
+    // Audio files
+    if (['mp3', 'wav', 'flac', 'aac', 'ogg', 'wma'].includes(ext)) {
+        return '🎵';
+    }
+    // Document files
+    if (['pdf', 'doc', 'docx', 'txt', 'rtf', 'odt'].includes(ext)) {
+        return '📄';
+    }
+    // Archive files
+    if (['zip', 'rar', '7z', 'tar', 'gz'].includes(ext)) {
+        return '📦';
+    }
+    // Code files
+    if (['js', 'py', 'html', 'css', 'json', 'xml', 'sql', 'php', 'java', 'cpp', 'c'].includes(ext)) {
+        return '💻';
+    }
+    // Data files
+    if (['csv', 'xls', 'xlsx', 'db'].includes(ext)) {
+        return '📊';
+    }
+    // Design files
+    if (['psd', 'ai', 'sketch', 'fig'].includes(ext)) {
+        return '🎨';
+    }
+    
+    // Default file icon
+    return '📁';
+}
+
+// Pool of chunk preparation workers so hashing runs on every core and
+// overlaps with network sends instead of blocking the page
+class HashPool {
+    constructor(size) {
+        this.size = size;
+        this.idle = [];
+        this.waiting = [];
+        this.pending = new Map();
+        this.nextId = 0;
+        for (let i = 0; i < size; i++) {
+            const worker = new Worker('/static/hash-worker.js');
+            worker.onmessage = (e) => this.onMessage(worker, e.data);
+            this.idle.push(worker);
+        }
+    }
+    
+    prepare(file, start, end) {
+        return new Promise((resolve, reject) => {
+            const job = { id: this.nextId++, file, start, end, resolve, reject };
+            const worker = this.idle.pop();
+            if (worker) {
+                this.dispatch(worker, job);
+            } else {
+                this.waiting.push(job);
+            }
+        });
+    }
+    
+    dispatch(worker, job) {
+        this.pending.set(job.id, job);
+        worker.postMessage({ id: job.id, file: job.file, start: job.start, end: job.end });
+    }
+    
+    onMessage(worker, data) {
+        const job = this.pending.get(data.id);
+        this.pending.delete(data.id);
+        const next = this.waiting.shift();
+        if (next) {
+            this.dispatch(worker, next);
+        } else {
+            this.idle.push(worker);
+        }
+        if (data.error) {
+            job.reject(new Error(data.error));
+        } else {
+            job.resolve({ data: data.buffer, hash: data.hash });
+        }
+    }
+}
+
+let hashPool = null;
+
+function getHashPool() {
+    if (!hashPool && typeof Worker !== 'undefined') {
+        const cores = navigator.hardwareConcurrency || 4;
+        hashPool = new HashPool(Math.max(2, Math.min(cores, 8)));
+    }
+    return hashPool;
+}
+
+async function prepareChunk(file, start, end) {
+    const pool = getHashPool();
+    if (!pool) {
+        // No worker support: send the raw slice without a checksum
+        return { data: file.slice(start, end), hash: null };
+    }
+    return pool.prepare(file, start, end);
+}
+
+async function uploadFile(file) {
+    const uploadId = generateUploadId();
+    // 16MB chunks, larger for huge files so they stay within object storage's 10,000 part limit
+    const chunkSize = Math.max(16, Math.ceil(file.size / 10000 / (1024 * 1024))) * 1024 * 1024;
+    const totalChunks = Math.ceil(file.size / chunkSize);
+    
+    // Create upload UI
+    const uploadDiv = createUploadUI(uploadId, file.name, file.size);
+    uploadsList.appendChild(uploadDiv);
+    
+    try {
+        // Start upload session
+        const startResponse = await fetchWithBackoff('/start-upload', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({
+                upload_id: uploadId,
+                filename: file.name,
+                total_size: file.size,
+                total_chunks: totalChunks,
+                compression: document.getElementById('compressToggle').checked ? 'zstd' : undefined
+            })
+        });
+        if (!startResponse.ok) {
+            const error = await startResponse.json().catch(() => ({}));
+            throw new Error(error.detail || `Start failed: ${startResponse.status}`);
+        }
+        
+        updateStatus(uploadId, 'Uploading chunks...', 'uploading');
+        
+        // Upload chunks with maximum parallelism
+        const maxConcurrent = 6; // Optimal for most connections
+        const semaphore = new Semaphore(maxConcurrent);
+        // Hash chunks ahead of the network, bounded so prepared buffers don't pile up in memory
+        const pool = getHashPool();
+        const prepareAhead = new Semaphore(maxConcurrent + (pool ? pool.size : 0));
+        const chunkPromises = [];
+        
+        for (let chunkIndex = 0; chunkIndex < totalChunks; chunkIndex++) {
+            const start = chunkIndex * chunkSize;
+            const end = Math.min(start + chunkSize, file.size);
+            
+            chunkPromises.push(
+                prepareAhead.acquire().then(async (releasePrepared) => {
+                    try {
+                        const prepared = await prepareChunk(file, start, end);
+                        const release = await semaphore.acquire();
+                        try {
+                            await uploadChunk(uploadId, chunkIndex, prepared, totalChunks);
+                        } finally {
+                            release();
+                        }
+                    } finally {
+                        releasePrepared();
+                    }
+                })
+            );
+        }
+        
+        await Promise.all(chunkPromises);
+        
+        updateStatus(uploadId, 'Completing upload...', 'uploading');
+        
+        // Complete upload
+        const completeResponse = await fetch(`/complete-upload/${uploadId}`, {method: 'POST'});
+        const completeResult = await completeResponse.json();
+        
+        updateStatus(uploadId, `✅ Upload completed successfully! Saved as: ${completeResult.filename}`, 'success');
+        
+    } catch (error) {
+        updateStatus(uploadId, `❌ Upload failed: ${error.message}`, 'error');
+        console.error('Upload error:', error);
+    }
+}
+
+async function uploadChunk(uploadId, chunkIndex, prepared, totalChunks) {
+    const formData = new FormData();
+    formData.append('chunk', new Blob([prepared.data]));
+    formData.append('chunk_index', chunkIndex);
+    formData.append('total_chunks', totalChunks);
+    if (prepared.hash) {
+        formData.append('chunk_sha256', prepared.hash);
+    }
+    
+    const response = await fetchWithBackoff(`/upload-chunk/${uploadId}`, {
+        method: 'POST',
+        body: formData
+    });
+    
+    if (!response.ok) {
+        throw new Error(`Chunk ${chunkIndex} upload failed: ${response.status}`);
+    }
+}
+
+// Retry when the server sheds load (429/503), waiting as long as Retry-After asks
+async function fetchWithBackoff(url, options, maxRetries = 30) {
+    for (let attempt = 0; ; attempt++) {
+        const response = await fetch(url, options);
+        if ((response.status !== 429 && response.status !== 503) || attempt >= maxRetries) {
+            return response;
+        }
+        const retryAfter = parseFloat(response.headers.get('Retry-After')) || 1;
+        // Jitter so throttled chunks don't all come back at once
+        const delay = retryAfter * 1000 * (0.75 + Math.random() * 0.5);
+        await new Promise((resolve) => setTimeout(resolve, delay));
+    }
+}
+
+function createUploadUI(uploadId, filename, fileSize) {
+    const div = document.createElement('div');
+    div.className = 'file-upload-item';
+    div.id = `upload-${uploadId}`;
+    
+    div.innerHTML = `
+        <div class="file-header">
+            <div class="file-name">🎬 ${filename}</div>
+            <div class="file-size">📦 Size: ${formatBytes(fileSize)}</div>
+        </div>
+        <div class="progress-section">
+            <div class="progress-bar">
+                <div class="progress-fill" id="progress-${uploadId}" style="width: 0%"></div>
+                <div class="progress-text" id="progress-text-${uploadId}">0%</div>
+            </div>
+            <div class="stats">
+                <div class="stat-card">
+                    <div class="stat-value" id="speed-${uploadId}">0 MB/s</div>
+                    <div class="stat-label">🚀 Upload Speed</div>
+                </div>
+                <div class="stat-card">
+                    <div class="stat-value" id="uploaded-${uploadId}">0 MB</div>
+                    <div class="stat-label">📤 Uploaded</div>
+                </div>
+                <div class="stat-card">
+                    <div class="stat-value" id="chunks-${uploadId}">0/0</div>
+                    <div class="stat-label">🧩 Chunks</div>
+                </div>
+                <div class="stat-card">
+                    <div class="stat-value" id="eta-${uploadId}">--:--</div>
+                    <div class="stat-label">⏱️ ETA</div>
+                </div>
+            </div>
+            <div class="status uploading" id="status-${uploadId}">Initializing upload...</div>
+        </div>
+    `;
+    
+    // Start progress monitoring
+    monitorProgress(uploadId);
+    
+    return div;
+}
+
+function monitorProgress(uploadId) {
+    const interval = setInterval(async () => {
+        try {
+            const response = await fetch(`/progress/${uploadId}`);
+            if (response.ok) {
+                const progress = await response.json();
+                updateProgressUI(uploadId, progress);
+                
+                if (progress.status === 'completed') {
+                    clearInterval(interval);
+                }
+            }
+        } catch (error) {
+            console.error('Progress monitoring error:', error);
+        }
+    }, 200); // Update every 200ms for smooth progress
+}
+
+function updateProgressUI(uploadId, progress) {
+    document.getElementById(`progress-${uploadId}`).style.width = `${progress.progress_percent}%`;
+    document.getElementById(`progress-text-${uploadId}`).textContent = `${progress.progress_percent}%`;
+    document.getElementById(`speed-${uploadId}`).innerHTML = `${progress.speed_mb_s}<span class="speed-indicator">${progress.speed_mbps} Mbps</span>`;
+    document.getElementById(`uploaded-${uploadId}`).textContent = formatBytes(progress.uploaded_size);
+    document.getElementById(`chunks-${uploadId}`).textContent = `${progress.received_chunks}/${progress.total_chunks}`;
+    
+    // Format ETA
+    if (progress.eta_seconds > 0) {
+        const eta = formatTime(progress.eta_seconds);
+        document.getElementById(`eta-${uploadId}`).textContent = eta;
+    } else {
+        document.getElementById(`eta-${uploadId}`).textContent = 'Complete';
+    }
+}
+
+function updateStatus(uploadId, message, className) {
+    const statusElement = document.getElementById(`status-${uploadId}`);
+    statusElement.textContent = message;
+    statusElement.className = `status ${className}`;
+}
+
+function generateUploadId() {
+    return Date.now().toString(36) + Math.random().toString(36).substr(2);
+}
+
+function formatBytes(bytes) {
+    if (bytes === 0) return '0 B';
+    const k = 1024;
+    const sizes = ['B', 'KB', 'MB', 'GB', 'TB'];
+    const i = Math.floor(Math.log(bytes) / Math.log(k));
+    return parseFloat((bytes / Math.pow(k, i)).toFixed(2)) + ' ' + sizes[i];
+}
+
+function formatTime(seconds) {
+    if (seconds < 60) return `${Math.round(seconds)}s`;
+    const minutes = Math.floor(seconds / 60);
+    const remainingSeconds = Math.round(seconds % 60);
+    if (minutes < 60) return `${minutes}m ${remainingSeconds}s`;
+    const hours = Math.floor(minutes / 60);
+    const remainingMinutes = minutes % 60;
+    return `${hours}h ${remainingMinutes}m`;
+}
+
+class Semaphore {
+    constructor(max) {
+        this.max = max;
+        this.current = 0;
+        this.queue = [];
+    }
+    
+    acquire() {
+        return new Promise((resolve) => {
+            if (this.current < this.max) {
+                this.current++;
+                resolve(() => this.release());
+            } else {
+                this.queue.push(() => {
+                    this.current++;
+                    resolve(() => this.release());
+                });
+            }
+        });
+    }
+    
+    release() {
+        this.current--;
+        if (this.queue.length > 0) {
+            const next = this.queue.shift();
+            next();
+        }
+    }
+}
+
+// Show network info on page load
+console.log('🚀 Ultra Fast Video Upload Server Ready!');
+console.log('📡 Access from other devices using: http://' + location.host);
@@ -0,0 +1,20 @@
+import json
+import os
+import sys
+import tempfile
+
+# Point the server's directories at a scratch dir before main builds its volumes
+_work_dir = tempfile.mkdtemp(prefix="upload-tests-")
+_config = os.path.join(_work_dir, "config.json")
+with open(_config, "w") as f:
+    json.dump({
+        "UPLOAD_DIR": os.path.join(_work_dir, "uploads"),
+        "TEMP_DIR": os.path.join(_work_dir, "chunks"),
+        "ENCRYPTION_KEY_FILE": os.path.join(_work_dir, "encryption.key"),
+        "DURABILITY": "none",
+        "ADMIN_TOKEN": "test-token"
+    }, f)
+os.environ["UPLOAD_SERVER_CONFIG"] = _config
+os.environ.update(AWS_ACCESS_KEY_ID="testing", AWS_SECRET_ACCESS_KEY="testing", AWS_DEFAULT_REGION="us-east-1")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
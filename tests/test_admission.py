@@ -0,0 +1,22 @@
+"""Admission control in front of /upload-chunk."""
+from fastapi.testclient import TestClient
+
+import main
+
+
+def test_cross_origin_rejection_is_readable(monkeypatch):
+    monkeypatch.setattr(main, "MAX_INFLIGHT_BYTES", 10)
+    monkeypatch.setattr(main.admission, "inflight_bytes", 5)
+    client = TestClient(main.app)
+
+    response = client.post(
+        "/upload-chunk/anything",
+        files={"chunk": b"x" * 100},
+        data={"chunk_index": 0, "total_chunks": 1},
+        headers={"Origin": "https://example.com"}
+    )
+
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "1"
+    assert response.headers["access-control-allow-origin"] in ("*", "https://example.com")
+    assert "retry-after" in response.headers["access-control-expose-headers"].lower()
@@ -0,0 +1,55 @@
+"""Write modes of the thread pool I/O engine."""
+import os
+
+import pytest
+
+import main
+
+pytestmark = pytest.mark.skipif(main.fcntl is None or not hasattr(os, "O_DIRECT"), reason="needs O_DIRECT")
+
+
+def test_direct_writes_stay_direct_after_an_unaligned_batch(tmp_path, monkeypatch):
+    engine = main.ThreadPoolIOEngine(write_mode="direct", durability="none")
+    path = str(tmp_path / "file.bin")
+    fd = engine._open(path)
+    if not engine.open_files[fd]['direct']:
+        engine._close(fd, final=False)
+        pytest.skip("filesystem without O_DIRECT")
+
+    writes = []
+    original = main.ThreadPoolIOEngine._pwritev
+
+    def record(self, fd, buffers, offset):
+        direct = bool(main.fcntl.fcntl(fd, main.fcntl.F_GETFL) & os.O_DIRECT)
+        writes.append((offset, sum(len(b) for b in buffers), direct))
+        return original(self, fd, buffers, offset)
+
+    monkeypatch.setattr(main.ThreadPoolIOEngine, "_pwritev", record)
+    # Frame sizes of an encrypted upload: every batch after the first starts unaligned
+    batches = [[os.urandom(main.DIRECT_IO_ALIGNMENT * 3 + 28)], [os.urandom(50000), os.urandom(70000)], [os.urandom(100)]]
+    offset = 0
+    for buffers in batches:
+        offset = engine._write(None, fd, buffers, offset)
+    engine._close(fd, final=False)
+
+    assert open(path, "rb").read() == b"".join(b"".join(buffers) for buffers in batches)
+    for start, length, direct in writes:
+        if direct:
+            assert start % main.DIRECT_IO_ALIGNMENT == 0 and length % main.DIRECT_IO_ALIGNMENT == 0
+        else:
+            assert length < 2 * main.DIRECT_IO_ALIGNMENT
+    # The second batch is mostly written direct despite starting at an odd offset
+    second = [length for start, length, direct in writes if direct and start > main.DIRECT_IO_ALIGNMENT * 3]
+    assert sum(second) >= 120000 - 2 * main.DIRECT_IO_ALIGNMENT
+
+
+@pytest.mark.parametrize("write_mode, dropped", [("buffered", False), ("dontneed", True), ("direct", True)])
+def test_chunk_reads_drop_the_page_cache(tmp_path, monkeypatch, write_mode, dropped):
+    engine = main.ThreadPoolIOEngine(write_mode=write_mode, durability="none")
+    path = tmp_path / "chunk"
+    path.write_bytes(b"chunk data")
+    advice = []
+    monkeypatch.setattr(os, "posix_fadvise", lambda fd, offset, length, flag: advice.append(flag))
+
+    assert engine._read_file(str(path)) == b"chunk data"
+    assert (os.POSIX_FADV_DONTNEED in advice) == dropped
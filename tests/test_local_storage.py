@@ -0,0 +1,128 @@
+"""Local storage backend: chunks staged on the temp volumes and assembled on an upload volume."""
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+@pytest.fixture
+def local(monkeypatch):
+    monkeypatch.setattr(main, "storage", main.LocalStorageBackend())
+    for volume in main.volume_manager.upload_volumes:
+        shutil.rmtree(volume.path, ignore_errors=True)
+        os.makedirs(volume.path)
+    main.frame_index_cache.clear()
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app, headers={"X-Admin-Token": main.ADMIN_TOKEN})
+
+
+def send_chunks(client, upload_id, filename, data, chunk_size):
+    chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+    response = client.post("/start-upload", json={
+        "upload_id": upload_id,
+        "filename": filename,
+        "total_size": len(data),
+        "total_chunks": len(chunks)
+    })
+    assert response.status_code == 200, response.text
+    for index, chunk in enumerate(chunks):
+        response = client.post(
+            f"/upload-chunk/{upload_id}",
+            files={"chunk": chunk},
+            data={"chunk_index": index, "total_chunks": len(chunks)}
+        )
+        assert response.status_code == 200, response.text
+
+
+async def complete_together(*upload_ids):
+    async with httpx.AsyncClient(app=main.app, base_url="http://test") as client:
+        return await asyncio.gather(*(client.post(f"/complete-upload/{upload_id}") for upload_id in upload_ids))
+
+
+@pytest.mark.parametrize("encrypt", [False, True])
+def test_concurrent_completions_get_separate_names(local, client, monkeypatch, encrypt):
+    if encrypt:
+        pytest.importorskip("cryptography")
+    monkeypatch.setattr(main, "ENCRYPT_AT_REST", encrypt)
+    first, second = os.urandom(300 * 1024), os.urandom(200 * 1024)
+    send_chunks(client, "first", "same.mp4", first, 64 * 1024)
+    send_chunks(client, "second", "same.mp4", second, 64 * 1024)
+
+    responses = asyncio.run(complete_together("first", "second"))
+
+    assert [response.status_code for response in responses] == [200, 200]
+    names = [response.json()["filename"] for response in responses]
+    assert sorted(names) == ["same.mp4", "same_1.mp4"]
+    assert client.get(f"/download/{names[0]}").content == first
+    assert client.get(f"/download/{names[1]}").content == second
+    assert not main.storage.claimed_names
+
+
+def test_chunks_are_not_spooled_to_disk(local, client, monkeypatch):
+    pytest.importorskip("cryptography")
+    monkeypatch.setattr(main, "ENCRYPT_AT_REST", True)
+
+    def rollover(self):
+        raise AssertionError("chunk spooled to a temp file")
+
+    monkeypatch.setattr(tempfile.SpooledTemporaryFile, "rollover", rollover)
+    data = os.urandom(3 * 1024 * 1024)
+    send_chunks(client, "secret", "secret.bin", data, len(data))
+    response = client.post("/complete-upload/secret")
+
+    assert response.status_code == 200, response.text
+    assert data[:1024] not in open(response.json()["location"], "rb").read()
+
+
+def test_chunk_form_is_validated(local, client):
+    client.post("/start-upload", json={"upload_id": "form", "filename": "form.bin", "total_size": 3, "total_chunks": 1})
+
+    response = client.post("/upload-chunk/form", files={"chunk": b"abc"}, data={"chunk_index": "x", "total_chunks": 1})
+    assert response.status_code == 422
+    response = client.post("/upload-chunk/form", data={"chunk_index": 0, "total_chunks": 1})
+    assert response.status_code in (400, 422)
+    response = client.post(
+        "/upload-chunk/form",
+        files={"chunk": b"abc"},
+        data={"chunk_index": 0, "total_chunks": 1, "chunk_sha256": "00" * 32}
+    )
+    assert response.status_code == 422
+    response = client.post(
+        "/upload-chunk/form",
+        files={"chunk": b"abc"},
+        data={"chunk_index": 0, "total_chunks": 1, "chunk_sha256": hashlib.sha256(b"abc").hexdigest()}
+    )
+    assert response.json()["verified"] is True
+
+
+def test_downloads_need_the_admin_token(local, client, monkeypatch):
+    send_chunks(client, "private", "private.bin", b"secret", 1024)
+    assert client.post("/complete-upload/private").status_code == 200
+    anonymous = TestClient(main.app)
+
+    assert anonymous.get("/download/private.bin").status_code == 403
+    assert anonymous.get("/download/private.bin", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.get("/download/private.bin").content == b"secret"
+    monkeypatch.setattr(main, "PUBLIC_DOWNLOADS", True)
+    assert anonymous.get("/download/private.bin").content == b"secret"
+
+
+def test_download_names_stay_inside_the_upload_volumes(local, client, monkeypatch):
+    pytest.importorskip("cryptography")
+    monkeypatch.setattr(main, "ENCRYPT_AT_REST", True)
+    send_chunks(client, "indexed", "indexed.bin", b"data", 1024)
+    assert client.post("/complete-upload/indexed").status_code == 200
+
+    assert client.get("/download/indexed.bin.frames.json").status_code == 404
+    assert client.get("/download/..%5Cconfig.json").status_code == 404
+    assert asyncio.run(main.storage.find_file("..")) is None
@@ -0,0 +1,154 @@
+"""S3 storage backend against moto's in-process S3 stand-in.
+
+    pip install pytest boto3 moto cryptography zstandard
+    python -m pytest tests
+"""
+import json
+import os
+
+import pytest
+
+pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+import boto3
+from fastapi.testclient import TestClient
+
+import main
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=main.S3_BUCKET)
+        monkeypatch.setattr(main, "storage", main.S3StorageBackend(region="us-east-1"))
+        main.frame_index_cache.clear()
+        yield client
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app, headers={"X-Admin-Token": main.ADMIN_TOKEN})
+
+
+def upload(client, upload_id, filename, data, chunk_size, compression=None):
+    chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+    response = client.post("/start-upload", json={
+        "upload_id": upload_id,
+        "filename": filename,
+        "total_size": len(data),
+        "total_chunks": len(chunks),
+        "compression": compression
+    })
+    assert response.status_code == 200, response.text
+    # Out of order, as parallel browser uploads arrive
+    for index in reversed(range(len(chunks))):
+        response = client.post(
+            f"/upload-chunk/{upload_id}",
+            files={"chunk": chunks[index]},
+            data={"chunk_index": index, "total_chunks": len(chunks)}
+        )
+        assert response.status_code == 200, response.text
+    response = client.post(f"/complete-upload/{upload_id}")
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def stored_object(s3, location):
+    key = location[len(f"s3://{main.S3_BUCKET}/"):]
+    return s3.get_object(Bucket=main.S3_BUCKET, Key=key)["Body"].read()
+
+
+def test_multipart_round_trip(s3, client):
+    data = os.urandom(12 * MB + 123)
+    result = upload(client, "round-trip", "video.mp4", data, 5 * MB)
+
+    assert result["location"] == f"s3://{main.S3_BUCKET}/{main.S3_PREFIX}video.mp4"
+    assert stored_object(s3, result["location"]) == data
+    assert client.get("/download/video.mp4").content == data
+    assert [item["filename"] for item in client.get("/uploads").json()["uploads"]] == ["video.mp4"]
+
+
+def test_same_name_uploads_stay_separate(s3, client):
+    first, second = os.urandom(1000), os.urandom(2000)
+    names = [upload(client, "first", "clip.mp4", first, MB)["filename"],
+             upload(client, "second", "clip.mp4", second, MB)["filename"]]
+
+    assert names == ["clip.mp4", "clip_1.mp4"]
+    assert client.get("/download/clip.mp4").content == first
+    assert client.get("/download/clip_1.mp4").content == second
+
+
+def test_parts_under_minimum_are_rejected(s3, client):
+    response = client.post("/start-upload", json={
+        "upload_id": "small", "filename": "small.bin", "total_size": 6, "total_chunks": 2
+    })
+    assert response.status_code == 200
+    response = client.post(
+        "/upload-chunk/small",
+        files={"chunk": b"abc"},
+        data={"chunk_index": 0, "total_chunks": 2}
+    )
+    assert response.status_code == 400
+    assert "at least 5 MB" in response.json()["detail"]
+
+
+def test_compressed_parts_are_padded(s3, client):
+    pytest.importorskip("zstandard")
+    line = b"2026-10-19 12:00:00 INFO request path=/api/v1/items status=200\n"
+    data = line * (11 * MB // len(line))
+    result = upload(client, "logs", "app.log", data, 5 * MB, compression="zstd")
+
+    index = main.FrameIndex(json.loads(stored_object(s3, result["location"] + main.FRAME_INDEX_SUFFIX)))
+    stored_sizes = [frame[1] for frame in index.frames]
+    assert all(frame[2] == "zstd" for frame in index.frames)
+    # Every part but the last reaches the S3 minimum through a skippable frame
+    assert all(size >= main.S3_MIN_PART_SIZE for size in stored_sizes[:-1])
+    assert stored_sizes[-1] < main.S3_MIN_PART_SIZE
+
+    assert client.get("/download/app.log").content == data
+    response = client.get("/download/app.log", headers={"Range": f"bytes={5 * MB - 10}-{5 * MB + 10}"})
+    assert response.status_code == 206
+    assert response.content == data[5 * MB - 10:5 * MB + 11]
+
+
+def test_encrypted_range_download(s3, client, monkeypatch):
+    pytest.importorskip("cryptography")
+    monkeypatch.setattr(main, "ENCRYPT_AT_REST", True)
+    data = os.urandom(10 * MB + 500)
+    result = upload(client, "secret", "secret.bin", data, 5 * MB)
+
+    assert data[:1024] not in stored_object(s3, result["location"])
+    start, end = 5 * MB - 100, 5 * MB + 100  # Spans two encrypted frames
+    response = client.get("/download/secret.bin", headers={"Range": f"bytes={start}-{end}"})
+    assert response.status_code == 206
+    assert response.headers["Content-Range"] == f"bytes {start}-{end}/{len(data)}"
+    assert response.content == data[start:end + 1]
+
+
+def test_encrypted_file_without_index_is_not_served(s3, client, monkeypatch):
+    pytest.importorskip("cryptography")
+    monkeypatch.setattr(main, "ENCRYPT_AT_REST", True)
+    result = upload(client, "lost", "lost.bin", os.urandom(1000), MB)
+    key = result["location"][len(f"s3://{main.S3_BUCKET}/"):]
+    s3.delete_object(Bucket=main.S3_BUCKET, Key=key + main.FRAME_INDEX_SUFFIX)
+
+    assert client.get("/download/lost.bin").status_code == 500
+
+
+def test_abandoned_upload_gives_up_its_name(s3, client):
+    response = client.post("/start-upload", json={
+        "upload_id": "abandoned", "filename": "clip.mp4", "total_size": 1000, "total_chunks": 1
+    })
+    assert response.status_code == 200
+    main.upload_manager.active_uploads["abandoned"]['last_activity'] -= main.UPLOAD_IDLE_TIMEOUT + 1
+
+    data = os.urandom(1000)
+    assert upload(client, "fresh", "clip.mp4", data, MB)["filename"] == "clip.mp4"
+    assert client.get("/download/clip.mp4").content == data
+    # The abandoned session is aborted so it can't complete over the new object
+    assert client.post("/complete-upload/abandoned").status_code == 404
+    assert not s3.list_multipart_uploads(Bucket=main.S3_BUCKET).get("Uploads")